@@ -4,19 +4,22 @@ from udsoncan.client import Client
 from udsoncan.services import ReadDTCInformation
 from common import get_uds_client
 from client_config import DOIP_SERVER_IP, DoIP_LOGICAL_ADDRESS, DoIP_FUNCTION_ADDRESS
+from FoxPi_log import FOXPI_LOG
 
 class FoxPiDTC:
 
     def __init__(self, client, doip_client): # Initialization function; pass in the client parameter, which is the UDS communication object.
         self.client = client
         self.doip_client = doip_client
+        self.log = FOXPI_LOG
 
     def Read_DTCs(self):
+        physical_address = self.doip_client._ecu_logical_address # remember the physical address this client talks to
         self.doip_client._ecu_logical_address = DoIP_FUNCTION_ADDRESS # change to the functional address to read all DTCs
         resp = self.client.read_dtc_information(ReadDTCInformation.Subfunction.reportDTCByStatusMask, status_mask=0x0F) # 0x0F to read problem DTC 
-        print(f"response: {resp}")
+        self.log.debug("FoxPiDTC", "response: %s", resp)
         if resp.service_data.dtcs is None or len(resp.service_data.dtcs) == 0:
-            self.doip_client._ecu_logical_address = DoIP_LOGICAL_ADDRESS # change back to the physical address
+            self.doip_client._ecu_logical_address = physical_address # change back to the physical address
             return "Success, no DTCs found"
         else:
             cfg = {}
@@ -28,16 +31,17 @@ class FoxPiDTC:
                     "confirmed": dtc.status.confirmed,
                     "test_failed": dtc.status.test_failed
                 }
-            self.doip_client._ecu_logical_address = DoIP_LOGICAL_ADDRESS # change back to the physical address
+            self.doip_client._ecu_logical_address = physical_address # change back to the physical address
             return cfg
     
     def Clear_DTCs(self):
+        physical_address = self.doip_client._ecu_logical_address # remember the physical address this client talks to
         self.doip_client._ecu_logical_address = DoIP_FUNCTION_ADDRESS # change to the functional address to clear all DTCs
         try:
             resp = self.client.clear_dtc(group=0xFFFFFF) # 0xFFFFFF= clear all DTC
-            self.doip_client._ecu_logical_address = DoIP_LOGICAL_ADDRESS# change back to the physical address
+            self.doip_client._ecu_logical_address = physical_address# change back to the physical address
             return "Clear DTCs successful"
         except Exception as e:
             #print(f"Clear DTCs failed: {e}")
-            self.doip_client._ecu_logical_address = DoIP_LOGICAL_ADDRESS # change back to the physical address
+            self.doip_client._ecu_logical_address = physical_address # change back to the physical address
             return e
\ No newline at end of file
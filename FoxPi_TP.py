@@ -1,11 +1,77 @@
 # FoxPi_TP.py
+from FoxPi_channel import FoxPiChannel
+
+from contextlib import nullcontext
+import threading
+import time
 
 
 class FoxPiTP:
-      
+
     def __init__(self, client): # Initialization function; pass in the client parameter, which is the UDS communication object.
         self.client = client
 
     def TesterPresent(self): # Define a TesterPresent function to send a tester present request to the ECU.
-        with self.client.suppress_positive_response():
-            self.client.tester_present()
\ No newline at end of file
+        with getattr(self.client, "lock", None) or nullcontext(): # keep the suppress flag and the request together on a shared FoxPiChannel
+            with self.client.suppress_positive_response():
+                self.client.tester_present()
+
+
+class FoxPiKeepAlive:
+
+    def __init__(self, channel, period=2.0): # pass in the FoxPiChannel shared with the readers/writers; period in seconds, keep it below the ECU S3 time
+        self.channel = channel if isinstance(channel, FoxPiChannel) else FoxPiChannel(channel)
+        self.tp = FoxPiTP(self.channel)
+        self.period = period
+        self.sent = 0 # TesterPresent requests sent
+        self.skipped = 0 # ticks skipped because other traffic kept the session alive or a request was in flight
+        self.failed = 0 # TesterPresent requests that raised
+        self.last_error = None
+        self._own_activity = None # channel.last_activity right after our own TesterPresent
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tick(self): # one keep-alive period: send TesterPresent unless the channel was used recently or is busy
+        if self.channel.last_activity != self._own_activity and self.channel.idle() < self.period: # someone else talked to the ECU this period
+            self.skipped += 1
+            return
+        if not self.channel.lock.acquire(blocking=False): # a request is in flight, it resets S3 by itself
+            self.skipped += 1
+            return
+        try:
+            self.tp.TesterPresent()
+            self.sent += 1
+            self._own_activity = self.channel.last_activity
+        except Exception as e:
+            self.failed += 1
+            self.last_error = e
+        finally:
+            self.channel.lock.release()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            self.tick()
+            next_tick += self.period
+
+    def start(self): # start the background keep-alive thread
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="FoxPi-TesterPresent", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self): # stop the keep-alive thread and wait for it to finish
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def counters(self): # sent / skipped / failed tick counters
+        return {"sent": self.sent, "skipped": self.skipped, "failed": self.failed}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,51 @@
+from FoxPi_read import FoxPiReadDID
+from FoxPi_write import FoxPiWriteDID
+from FoxPi_DTC import FoxPiDTC
+from FoxPi_TP import FoxPiTP
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+
+
+class AsyncProxy:
+
+    def __init__(self, target, owner): #wrap a FoxPi* object so each of its methods returns an awaitable
+        self._target = target
+        self._owner = owner
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self._owner.run(attr, *args, **kwargs)
+        return call
+
+
+class AsyncFoxPi:
+
+    def __init__(self, client, doip_client=None): #pass in the UDS client (and the DoIP client for DTC functional addressing)
+        #One worker thread owns the DoIP channel: every request is queued to it in submission order,
+        #so concurrent coroutines never interleave on the connection and the event loop never blocks.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FoxPi-UDS")
+        self.client = client
+        self.read = AsyncProxy(FoxPiReadDID(client), self) #await foxpi.read.FoxPi_Motion_Status(), foxpi.read.snapshot()
+        self.write = AsyncProxy(FoxPiWriteDID(client), self) #await foxpi.write.FoxPi_Lamp_Ctrl([...]), foxpi.write.Driving_Ctrl_toFF()
+        self.dtc = AsyncProxy(FoxPiDTC(client, doip_client), self) #await foxpi.dtc.Read_DTCs()
+        self.tp = AsyncProxy(FoxPiTP(client), self) #await foxpi.tp.TesterPresent()
+
+    async def run(self, func, *args, **kwargs): #run any blocking call that uses the UDS client on the channel thread
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self): #wait for queued requests and stop the channel thread
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,195 @@
+from doipclient import DoIPClient
+from doipclient.connectors import DoIPClientUDSConnector
+from udsoncan.client import Client
+from common import get_uds_client
+from client_config import DoIP_LOGICAL_ADDRESS
+from FoxPi_read import FoxPiReadDID, FOXPI_DIDS
+from FoxPi_signals import DECODE_PLANS
+from FoxPi_write import FoxPiWriteDID, DrivingCtrlEncoder, DRIVING_CTRL_LENGTH
+from FoxPi_TP import FoxPiTP
+from FoxPi_bulk import decode_records
+from FoxPi_sim import FoxPiSimulator, FoxPiSimECU, FoxPiSynthetic
+
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+
+# Benchmarks of the three paths the polling and control use cases depend on:
+#   decode.<getter>    FoxPiReadDID decoders on a payload already read (ops/s, higher is better)
+#   decode_record.<getter>  the same with records=True (FoxPiRecord results)
+#   decode_into.<getter>    DecodePlan.decode_into a reused record, from a memoryview at an offset as read_into() does
+#   bulk.<DID>         FoxPi_bulk.decode_records over recorded payloads (rows/s, higher is better)
+#   encode.<packer>    FoxPiWriteDID packers and DrivingCtrlEncoder without any I/O (ops/s, higher is better)
+#   latency.<request>  request round trips over loopback against FoxPi_sim (seconds, value = p50, lower is better)
+# Results are written as JSON and can be compared against a stored baseline:
+#   python FoxPi_bench.py --output base.json
+#   python FoxPi_bench.py --baseline base.json   (exit status 1 when a result regressed by more than --tolerance)
+
+DRIVING_CTRL_INPUT = [1.5, 1, 30.0, 1, 1, 1, -45.5, 1, 1, 2.5, 1, 3, 4, 5.0]
+LAMP_CTRL_INPUT = [1, 1, 0, 0, 1, 0, 1, 1, 0, 1, 1, 0, 0, 1, 1, 0, 1, 0, 0, 0, 1, 3, 12, 80, 2]
+
+
+class _NullClient: # accepts every request without I/O so the encode benchmarks time only the packers
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: SimpleNamespace(service_data=None, data=b"")
+
+
+def throughput(func: Callable[[], object], repeat=3) -> float: #calls per second, best of repeat runs of at least 0.2 s each
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    return loops / min(timer.repeat(repeat=repeat, number=loops))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]: #p50/p95/p99/max/mean of latency samples in seconds
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1], "mean": sum(ordered) / len(ordered)}
+
+
+def bench_decode(repeat=3) -> Dict[str, dict]:
+    synthetic = FoxPiSynthetic()
+    results = {}
+    for prefix, reader in (("decode", FoxPiReadDID(None)), ("decode_record", FoxPiReadDID(None, records=True))):
+        for did, (name, length) in FOXPI_DIDS.items():
+            payload = synthetic(did, 1.0)
+            getter = getattr(reader, name)
+            results[f"{prefix}.{name}"] = {"unit": "ops/s", "value": throughput(lambda: getter(payload), repeat)}
+    for did, (name, length) in FOXPI_DIDS.items():
+        view = memoryview(did.to_bytes(2, "big") + synthetic(did, 1.0)) # DID echo + data, as in a 0x22 response payload
+        plan = DECODE_PLANS[did]
+        record = plan.new_record()
+        results[f"decode_into.{name}"] = {"unit": "ops/s", "value": throughput(lambda: plan.decode_into(view, record, 2), repeat)}
+    return results
+
+
+def bench_bulk(rows=100000, repeat=3) -> Dict[str, dict]:
+    synthetic = FoxPiSynthetic()
+    results = {}
+    for did, (name, length) in FOXPI_DIDS.items():
+        records = b"".join(synthetic(did, i * 0.01) for i in range(1000)) * (rows // 1000)
+        calls = throughput(lambda: decode_records(did, records), repeat)
+        results[f"bulk.{name}"] = {"unit": "rows/s", "value": calls * (rows // 1000) * 1000}
+    return results
+
+
+def bench_encode(repeat=3) -> Dict[str, dict]:
+    writer = FoxPiWriteDID(_NullClient())
+    encoder = DrivingCtrlEncoder()
+    buffer = bytearray(DRIVING_CTRL_LENGTH)
+    cases = {
+        "encode.DrivingCtrlEncoder.encode": lambda: encoder.encode(DRIVING_CTRL_INPUT),
+        "encode.DrivingCtrlEncoder.encode_into": lambda: encoder.encode_into(DRIVING_CTRL_INPUT, buffer, validate=False),
+        "encode.FoxPi_Driving_Ctrl": lambda: writer.FoxPi_Driving_Ctrl(DRIVING_CTRL_INPUT),
+        "encode.FoxPi_Lamp_Ctrl": lambda: writer.FoxPi_Lamp_Ctrl(LAMP_CTRL_INPUT),
+        "encode.FoxPi_Ctrl_Enable_Switch": lambda: writer.FoxPi_Ctrl_Enable_Switch([1]),
+        "encode.Driving_Ctrl_toFF": writer.Driving_Ctrl_toFF,
+    }
+    results = {}
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull): # keep any output of the packers off the terminal
+        for name, case in cases.items():
+            results[name] = {"unit": "ops/s", "value": throughput(case, repeat)}
+    return results
+
+
+def bench_latency(requests=1000, latency=0.0, host="127.0.0.1") -> Dict[str, dict]:
+    results = {}
+    with FoxPiSimulator(FoxPiSimECU(latency=latency, seed=0), host=host, port=0) as sim:
+        doip_client = DoIPClient(host, DoIP_LOGICAL_ADDRESS, tcp_port=sim.port, protocol_version=3)
+        with Client(DoIPClientUDSConnector(doip_client), request_timeout=4, config=get_uds_client()) as client:
+            reader = FoxPiReadDID(client)
+            writer = FoxPiWriteDID(client)
+            tp = FoxPiTP(client)
+            frame = DrivingCtrlEncoder().encode(DRIVING_CTRL_INPUT)
+            cases = {
+                "latency.read_single": lambda: reader.read(0x1002, "FoxPi_Motion_Status"),
+                "latency.read_many": lambda: reader.read_many(FOXPI_DIDS),
+                "latency.snapshot": reader.snapshot,
+                "latency.write_Driving_Ctrl": lambda: writer.write(0x1001, frame),
+                "latency.tester_present": tp.TesterPresent,
+            }
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                writer.ensure_unlocked()
+                for name, case in cases.items():
+                    for _ in range(min(50, requests)): # warm up connection and caches
+                        case()
+                    samples = []
+                    for _ in range(requests):
+                        start = time.perf_counter()
+                        case()
+                        samples.append(time.perf_counter() - start)
+                    stats = percentiles(samples)
+                    results[name] = {"unit": "s", "value": stats["p50"], "requests": requests, **stats}
+    return results
+
+
+def run(only=("decode", "bulk", "encode", "latency"), requests=1000, latency=0.0, repeat=3) -> dict: #run the selected benchmarks and return the JSON document
+    results = {}
+    if "decode" in only:
+        results.update(bench_decode(repeat))
+    if "bulk" in only:
+        results.update(bench_bulk(repeat=repeat))
+    if "encode" in only:
+        results.update(bench_encode(repeat))
+    if "latency" in only:
+        results.update(bench_latency(requests, latency))
+    return {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "sim_latency": latency,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance=0.10) -> List[dict]: #per benchmark change against the baseline, regressed = worse by more than tolerance
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base["value"]:
+            continue
+        ratio = result["value"] / base["value"]
+        change = (1.0 / ratio if result["unit"] == "s" else ratio) - 1.0 # > 0 = faster
+        rows.append({"name": name, "unit": result["unit"], "baseline": base["value"], "current": result["value"],
+                     "change": change, "regressed": change < -tolerance})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FoxPi decode/encode throughput and loopback latency benchmarks")
+    parser.add_argument("--only", default="decode,bulk,encode,latency", help="comma separated benchmark groups")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per latency benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated ECU response time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="throughput runs, the best one is reported")
+    parser.add_argument("--output", help="write the JSON results to this file (stdout when omitted)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    document = run(args.only.split(","), args.requests, args.latency, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+    else:
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(document, json.load(f), args.tolerance)
+        for row in rows:
+            flag = "\033[91mREGRESSED\033[0m" if row["regressed"] else ""
+            print(f"{row['name']:<40} {row['baseline']:>14.6g} -> {row['current']:>14.6g} {row['unit']:<6} {row['change']:+7.1%} {flag}", file=sys.stderr)
+        sys.exit(1 if any(row["regressed"] for row in rows) else 0)
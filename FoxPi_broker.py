@@ -0,0 +1,236 @@
+from FoxPi_read import FoxPiReadDID, FOXPI_DIDS
+from FoxPi_write import FoxPiWriteDID, DrivingCtrlEncoder, DRIVING_CTRL_FF, DRIVING_CTRL_LENGTH
+from FoxPi_TP import FoxPiTP
+from FoxPi_log import FOXPI_LOG
+from client_config import DoIP_FUNCTION_ADDRESS
+from udsoncan.services import ReadDTCInformation
+
+from concurrent.futures import Future
+from typing import Callable, Iterable, List, Optional
+import itertools
+import queue
+import threading
+import time
+
+
+# One worker thread owns the udsoncan Client; every request is a job submitted with a priority and answered through a
+# concurrent.futures.Future. The worker always runs the most urgent queued job next (FIFO within a priority), so a control
+# write waits at most for the one request already on the wire, never for the status reads and DTC scans queued before it.
+# Multi-request operations (read_many, snapshot) are queued as one job per request so they can be overtaken between requests.
+# Jobs with a target address run with the DoIP target switched for exactly that job and restored afterwards, also when the
+# job raises; since only the worker touches the client, no other request can see the switched address. The DTC jobs are
+# sent to the functional address this way instead of through FoxPiDTC, which switches the address itself.
+#   broker = FoxPiBroker(client, doip_client)
+#   speed = broker.decode(0x1002).result()
+#   broker.driving_ctrl([...]) # CONTROL priority, overtakes queued reads
+
+CONTROL = 0 # Driving_Ctrl / lamp / enable writes and the safe state
+KEEP_ALIVE = 1 # TesterPresent
+STATUS = 2 # status DID reads
+BULK = 3 # snapshots and DTC operations
+
+PRIORITY_NAMES = {CONTROL: "control", KEEP_ALIVE: "keep_alive", STATUS: "status", BULK: "bulk"}
+
+
+class BrokerBusy(Exception): # the job was refused because max_pending jobs are already queued
+    pass
+
+
+class FoxPiBroker:
+
+    def __init__(self, client, doip_client=None, max_pending: Optional[int] = None):
+        # max_pending: queued STATUS/BULK jobs above which new ones fail with BrokerBusy (CONTROL and KEEP_ALIVE are always queued)
+        self.client = client
+        self.doip_client = doip_client
+        self.max_pending = max_pending
+        self.reader = FoxPiReadDID(client) # the objects the jobs run on, only used from the worker thread
+        self.writer = FoxPiWriteDID(client)
+        self.tp = FoxPiTP(client)
+        self.encoder = DrivingCtrlEncoder()
+        self.last_activity = 0.0 # time.monotonic() when the last job finished
+        self.stats = {priority: {"jobs": 0, "failed": 0, "expired": 0, "max_wait": 0.0} for priority in PRIORITY_NAMES}
+        self.log = FOXPI_LOG
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count() # FIFO order within one priority
+        self._pending = 0 # queued STATUS / BULK jobs
+        self._lock = threading.Lock()
+        self._closed = False
+        self._keep_alive = None
+        self._worker = threading.Thread(target=self._run, name="FoxPi-broker", daemon=True)
+        self._worker.start()
+
+    def submit(self, func: Callable, *args, priority=STATUS, target: Optional[int] = None, max_wait: Optional[float] = None, **kwargs) -> Future:
+        # queue func(*args, **kwargs) to run on the worker thread
+        # target: DoIP logical address to send this job's requests to (needs doip_client); max_wait: seconds the job may wait
+        # in the queue before it fails with TimeoutError instead of running (a stale status read is not worth sending)
+        if target is not None and self.doip_client is None:
+            raise ValueError("target addressing needs the DoIP client")
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("broker is closed")
+            if priority > KEEP_ALIVE:
+                if self.max_pending is not None and self._pending >= self.max_pending:
+                    raise BrokerBusy(f"{self._pending} jobs queued")
+                self._pending += 1
+            self._queue.put((priority, next(self._sequence), time.monotonic(), future, func, args, kwargs, target, max_wait))
+        return future
+
+    def _run(self):
+        while True:
+            priority, _, queued, future, func, args, kwargs, target, max_wait = self._queue.get()
+            if future is None: # close()
+                break
+            if priority > KEEP_ALIVE:
+                with self._lock:
+                    self._pending -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            stats = self.stats[priority]
+            wait = time.monotonic() - queued
+            stats["max_wait"] = max(stats["max_wait"], wait)
+            if max_wait is not None and wait > max_wait:
+                stats["expired"] += 1
+                future.set_exception(TimeoutError(f"job waited {wait:.3f} s in the queue"))
+                continue
+            stats["jobs"] += 1
+            address = None
+            try:
+                if target is not None:
+                    address = self.doip_client._ecu_logical_address
+                    self.doip_client._ecu_logical_address = target
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                stats["failed"] += 1
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                if address is not None:
+                    self.doip_client._ecu_logical_address = address
+                self.last_activity = time.monotonic()
+
+    def pending(self) -> int: #jobs waiting in the queue
+        return self._queue.qsize()
+
+    # status reads
+    def read(self, did: int, priority=STATUS, **options) -> Future: #byte data of one DID
+        return self.submit(self.reader.read, did, hex(did), priority=priority, **options)
+
+    def decode(self, did: int, priority=STATUS, **options) -> Future: #decoded values of one DID
+        return self.submit(self.reader.decode, did, priority=priority, **options)
+
+    def read_many(self, dids: Iterable[int], priority=STATUS, **options) -> Future: #{did: byte data}, one queued job per 0x22 request
+        batches = self.reader.batches(list(dict.fromkeys(dids)))
+        parts = [self.submit(self.reader.read_many, batch, priority=priority, **options) for batch in batches]
+        return self._gather(parts, lambda results: {did: data for result in results for did, data in result.items()})
+
+    def snapshot(self, dids: Iterable[int] = None, priority=BULK, **options) -> Future: #FoxPiReadDID.snapshot() as BULK jobs
+        reader = self.reader
+        return self._gather([self.read_many(FOXPI_DIDS if dids is None else dids, priority, **options)],
+                            lambda results: {FOXPI_DIDS[did][0]: reader.decode(did, data) for did, data in results[0].items()})
+
+    # control writes
+    def write(self, did: int, data, priority=CONTROL, **options) -> Future: #WriteDataByIdentifier in the unlocked session
+        return self.submit(self.writer.write, did, bytes(data), priority=priority, **options)
+
+    def driving_ctrl(self, user_input, priority=CONTROL, **options) -> Future: #validated and encoded in the caller's thread, sent as a CONTROL job
+        return self.write(0x1001, self.encoder.encode_into(user_input, bytearray(DRIVING_CTRL_LENGTH)), priority, **options) # own buffer per call, callers may be on several threads
+
+    def driving_ctrl_to_ff(self, priority=CONTROL, **options) -> Future: #Driving_Ctrl safe state
+        return self.write(0x1001, DRIVING_CTRL_FF, priority, **options)
+
+    def transaction(self, build: Callable, rollback=True, priority=CONTROL, **options) -> Future:
+        # build(tx) adds the writes of a FoxPiWriteTransaction in the caller's thread; the commit runs as one job
+        tx = self.writer.transaction(rollback)
+        build(tx)
+        return self.submit(tx.commit, priority=priority, **options)
+
+    # diagnostics
+    def tester_present(self, priority=KEEP_ALIVE, **options) -> Future:
+        return self.submit(self.tp.TesterPresent, priority=priority, **options)
+
+    def read_dtcs(self, status_mask=0x0F, priority=BULK, **options) -> Future: #the FoxPiDTC.Read_DTCs() result, read at the functional address
+        return self.submit(self._read_dtcs, status_mask, priority=priority, target=DoIP_FUNCTION_ADDRESS, **options)
+
+    def clear_dtcs(self, priority=BULK, **options) -> Future: #clear all DTCs at the functional address, a failure fails the future
+        return self.submit(self._clear_dtcs, priority=priority, target=DoIP_FUNCTION_ADDRESS, **options)
+
+    def _read_dtcs(self, status_mask):
+        response = self.client.read_dtc_information(ReadDTCInformation.Subfunction.reportDTCByStatusMask, status_mask=status_mask)
+        self.log.debug("FoxPiBroker", "DTC response: %s", response)
+        if not response.service_data.dtcs:
+            return "Success, no DTCs found"
+        return {dtc: {"DTC": f"0x{dtc.id:06X}", "pending": dtc.status.pending, "confirmed": dtc.status.confirmed, "test_failed": dtc.status.test_failed}
+                for dtc in response.service_data.dtcs}
+
+    def _clear_dtcs(self):
+        self.client.clear_dtc(group=0xFFFFFF) # 0xFFFFFF = all DTCs
+        return "Clear DTCs successful"
+
+    def _gather(self, parts: List[Future], combine: Callable) -> Future: #one future resolving when all parts are done
+        future = Future()
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            if any(part.cancelled() for part in parts):
+                future.cancel()
+                future.set_running_or_notify_cancel()
+                return
+            errors = [part.exception() for part in parts if part.exception() is not None]
+            if errors:
+                future.set_exception(errors[0])
+            else:
+                try:
+                    future.set_result(combine([part.result() for part in parts]))
+                except Exception as e:
+                    future.set_exception(e)
+        if not parts:
+            future.set_result(combine([]))
+        for part in parts:
+            part.add_done_callback(done)
+        return future
+
+    def start_keep_alive(self, period=2.0): #queue a TesterPresent whenever no job ran for period seconds
+        def run():
+            while not self._closed:
+                time.sleep(period / 4)
+                if time.monotonic() - self.last_activity >= period and self.pending() == 0 and not self._closed:
+                    try:
+                        self.tester_present().result()
+                    except Exception as e:
+                        self.log.error("FoxPiBroker", "TesterPresent failed: %s", e)
+        if self._keep_alive is None:
+            self._keep_alive = threading.Thread(target=run, name="FoxPi-broker-keepalive", daemon=True)
+            self._keep_alive.start()
+
+    def close(self, cancel_pending=False): #stop accepting jobs; run (or cancel) the queued ones and stop the worker
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if cancel_pending:
+                while True:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    job[3].cancel()
+                self._pending = 0
+            self._queue.put((max(PRIORITY_NAMES) + 1, next(self._sequence), 0.0, None, None, (), {}, None, None))
+        if self._worker is not threading.current_thread():
+            self._worker.join()
+        if self._keep_alive is not None:
+            self._keep_alive.join()
+            self._keep_alive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,67 @@
+from FoxPi_signals import SIGNAL_TABLE, extraction
+
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, Union
+import numpy as np
+
+
+def as_records(did: int, records) -> np.ndarray: #view recorded raw DID payloads as an N x len(DID) uint8 array without copying
+    length = SIGNAL_TABLE[did].length
+    if isinstance(records, np.ndarray):
+        if records.ndim != 2 or records.shape[1] < length:
+            raise ValueError(f"DID {hex(did)} records must be an N x {length} array, got shape {records.shape}")
+        if records.dtype == np.uint8:
+            return records
+        if not np.issubdtype(records.dtype, np.integer): # a float or object array is not raw payload bytes
+            raise TypeError(f"DID {hex(did)} records must be a uint8 array, got {records.dtype}")
+        if records.size and (records.min() < 0 or records.max() > 0xFF): # casting would wrap them into wrong bytes
+            raise ValueError(f"DID {hex(did)} records hold values outside 0..255")
+        return records.astype(np.uint8)
+    buffer = np.frombuffer(records, dtype=np.uint8)
+    if buffer.size % length:
+        raise ValueError(f"DID {hex(did)} buffer of {buffer.size} bytes is not a whole number of {length} byte records")
+    return buffer.reshape(-1, length)
+
+
+def extract(records: np.ndarray, start: int, length: int, payload_length: int) -> np.ndarray: #vectorized shift and mask of one bit range over every record
+    width, pos, shift, mask = extraction(start, length, payload_length)
+    raw = records[:, pos].astype(np.uint64)
+    for i in range(pos + 1, pos + width):
+        raw = (raw << np.uint64(8)) | records[:, i]
+    return (raw >> np.uint64(shift)) & np.uint64(mask)
+
+
+def quantize(value: np.ndarray, places: str) -> np.ndarray: #round down to the given decimal places exactly like Decimal(str(x)).quantize(..., ROUND_DOWN)
+    scale = 10 ** -Decimal(places).as_tuple().exponent
+    scaled = value * scale
+    result = np.trunc(scaled) / scale
+    #Truncating the float product only differs from truncating the decimal text when the product is next to an integer
+    #and the value is not already exact at that many places, redo those few with Decimal
+    edge = (np.abs(scaled - np.round(scaled)) < 1e-6 * np.maximum(1.0, np.abs(scaled))) & (result != value)
+    if edge.any():
+        quantum = Decimal(places)
+        unique, inverse = np.unique(value[edge], return_inverse=True)
+        exact = np.array([float(Decimal(str(x)).quantize(quantum, rounding=ROUND_DOWN)) for x in unique.tolist()], dtype=np.float64)
+        result[edge] = exact[inverse.reshape(-1)]
+    return result
+
+
+def decode_records(did: int, records) -> Dict[str, Union[np.ndarray, np.ma.MaskedArray]]: #decode N raw payloads of one DID into one column per signal
+    records = as_records(did, records)
+    spec = SIGNAL_TABLE[did]
+    columns = {}
+    for signal in spec.signals:
+        raw = extract(records, signal.start, signal.length, spec.length).astype(np.int64)
+        value = raw
+        if signal.factor != 1:
+            value = value * signal.factor
+        if signal.offset:
+            value = value + signal.offset
+        if signal.quantize:
+            value = quantize(value, signal.quantize)
+        if signal.sentinel is not None:
+            start, length = signal.sentinel
+            ff = extract(records, start, length, spec.length) == np.uint64((1 << length) - 1) #True where the scalar decoder reports "FF"
+            value = np.ma.MaskedArray(value, mask=ff)
+        columns[signal.name] = value
+    return columns
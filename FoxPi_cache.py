@@ -0,0 +1,152 @@
+from FoxPi_read import FoxPiReadDID, FOXPI_DIDS
+
+from typing import Dict, Iterable, Optional
+import threading
+import time
+
+
+# Read-through cache for FoxPiReadDID: every read(), read_many() and FoxPi_* decoder call is served from the cache while
+# the DID's byte data is younger than its max age, and concurrent callers missing the same DID share one in-flight
+# request instead of each sending their own. Writes invalidate the cached DIDs they affect through writer observers:
+#   reader = FoxPiCachedReadDID(client)
+#   reader.attach(writer) # FoxPiWriteDID, FoxPiWriteTransaction writes go through it as well
+#   reader.FoxPi_Switch_Status() # at most one 0x22 request per 0.5 s however often it is called
+
+# max age in seconds of the slow-changing status DIDs; DIDs not listed use default_max_age (0 = always read, still coalesced)
+DEFAULT_MAX_AGE = {
+    0x100A: 0.5, # FoxPi_Switch_Status
+    0x1011: 0.5, # FoxPi_Shifter_allow
+    0x100D: 1.0, # FoxPi_Battery_Status
+    0x1012: 0.5, # FoxPi_Ctrl_Enable_Switch
+}
+
+# written DID -> cached DIDs whose value the write changes
+INVALIDATES = {
+    0x1001: (0x1001,),
+    0x100C: (0x100C, 0x100B), # Lamp_Ctrl and the Lamp_Status it drives
+    0x1012: (0x1012,),
+}
+
+
+class _InFlight: # one outstanding request that other callers wait for
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.byte_data = None
+        self.error = None
+
+
+class FoxPiCachedReadDID(FoxPiReadDID):
+
+    def __init__(self, client, max_age: Optional[Dict[int, float]] = None, default_max_age=0.0, clock=time.monotonic, **kwargs):
+        # max_age: {did: seconds} overrides of DEFAULT_MAX_AGE; kwargs go to FoxPiReadDID (records, max_response_length, ...)
+        super().__init__(client, **kwargs)
+        self.max_age = {**DEFAULT_MAX_AGE, **(max_age or {})}
+        self.default_max_age = default_max_age
+        self.clock = clock
+        self.hits = 0 # calls answered from the cache
+        self.misses = 0 # DIDs read from the ECU
+        self.coalesced = 0 # calls that waited for another caller's request instead of sending one
+        self._entries: Dict[int, tuple] = {} # did -> (time.monotonic() when the request was sent, byte data)
+        self._in_flight: Dict[int, _InFlight] = {}
+        self._generation: Dict[int, int] = {} # bumped by invalidate(), a read that raced a write is not cached
+        self._lock = threading.Lock()
+
+    def _fresh(self, did: int, now: float) -> Optional[bytes]:
+        entry = self._entries.get(did)
+        if entry is not None and now - entry[0] <= self.max_age.get(did, self.default_max_age):
+            return entry[1]
+        return None
+
+    def _claim(self, dids: Iterable[int]):
+        # -> ({did: cached byte data}, {did: request of another caller to wait for}, [DIDs this caller has to read], generations)
+        cached, waiting, mine = {}, {}, []
+        now = self.clock()
+        with self._lock:
+            for did in dids:
+                byte_data = self._fresh(did, now)
+                if byte_data is not None:
+                    cached[did] = byte_data
+                elif did in self._in_flight:
+                    waiting[did] = self._in_flight[did]
+                else:
+                    self._in_flight[did] = _InFlight()
+                    mine.append(did)
+            self.hits += len(cached)
+            self.coalesced += len(waiting)
+            self.misses += len(mine)
+            generations = {did: self._generation.get(did, 0) for did in mine}
+        return cached, waiting, mine, generations
+
+    def _finish(self, dids, generations, started, values=None, error=None): #store the results of this caller's request and release the waiters
+        with self._lock:
+            for did in dids:
+                flight = self._in_flight.pop(did)
+                if error is not None:
+                    flight.error = error
+                else:
+                    flight.byte_data = values[did]
+                    if self._generation.get(did, 0) == generations[did]:
+                        self._entries[did] = (started, values[did])
+                flight.done.set()
+
+    def _wait(self, flights: Dict[int, _InFlight]) -> Dict[int, bytes]:
+        values = {}
+        for did, flight in flights.items():
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            values[did] = flight.byte_data
+        return values
+
+    def read(self, did, name): #byte data of the DID, from the cache while younger than its max age
+        cached, waiting, mine, generations = self._claim((did,))
+        if cached:
+            return cached[did]
+        if waiting:
+            return self._wait(waiting)[did]
+        started = self.clock()
+        try:
+            byte_data = super().read(did, name)
+        except BaseException as e:
+            self._finish(mine, generations, started, error=e)
+            raise
+        self._finish(mine, generations, started, {did: byte_data})
+        return byte_data
+
+    def read_many(self, dids: Iterable[int]) -> Dict[int, bytes]: #only the stale DIDs nobody else is reading go into the batched request
+        dids = list(dict.fromkeys(dids))
+        cached, waiting, mine, generations = self._claim(dids)
+        values = dict(cached)
+        if mine:
+            started = self.clock()
+            try:
+                read = super().read_many(mine)
+            except BaseException as e:
+                self._finish(mine, generations, started, error=e)
+                raise
+            self._finish(mine, generations, started, read)
+            values.update(read)
+        values.update(self._wait(waiting))
+        return {did: values[did] for did in dids}
+
+    def invalidate(self, *dids: int): #drop the cached byte data of the DIDs (all DIDs when none are given)
+        with self._lock:
+            for did in dids or list(FOXPI_DIDS):
+                self._entries.pop(did, None)
+                self._generation[did] = self._generation.get(did, 0) + 1
+
+    def __call__(self, did, direction, data): #writer observer: invalidate what a write changes
+        if direction == 1:
+            self.invalidate(*INVALIDATES.get(did, (did,)))
+
+    def attach(self, *writers): #invalidate on every successful write of the given FoxPiWriteDID objects
+        for writer in writers:
+            if self not in writer.observers:
+                writer.observers.append(self)
+        return self
+
+    def detach(self, *writers):
+        for writer in writers:
+            if self in writer.observers:
+                writer.observers.remove(self)
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+# Client attributes that only change local client state; they are handed out as is and do not count as traffic
+LOCAL_ATTRIBUTES = {"suppress_positive_response", "payload_override", "set_config", "set_configs", "refresh_config",
+                    "configure_logger", "service_log_prefix", "open", "close"}
+
+
+class FoxPiChannel:
+
+    def __init__(self, client): #wrap the udsoncan Client that owns the single DoIP connection
+        self.client = client
+        self.lock = threading.RLock() #held for every request; hold it yourself to keep a multi-request sequence together
+        self.last_activity = 0.0 #time.monotonic() when the last request finished
+
+    def touch(self): #mark that traffic just went out on the channel
+        self.last_activity = time.monotonic()
+
+    def idle(self) -> float: #seconds since the last request finished
+        return time.monotonic() - self.last_activity
+
+    def __getattr__(self, name): #forward client methods, serialized on the channel lock and timestamped
+        attr = getattr(self.client, name)
+        if name in LOCAL_ATTRIBUTES or name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self.lock:
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    self.last_activity = time.monotonic()
+        call.__name__ = name
+        return call
+
+    def __enter__(self):
+        self.client.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.client.__exit__(exc_type, exc, tb)
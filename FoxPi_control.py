@@ -0,0 +1,188 @@
+from FoxPi_write import FoxPiWriteDID, DrivingCtrlEncoder, DRIVING_CTRL_FF
+from FoxPi_log import FOXPI_LOG
+
+from collections import deque
+from typing import Callable, Dict, Optional, Sequence, Union
+import math
+import queue
+import threading
+import time
+
+
+class LoopStats:
+
+    def __init__(self, period: float, history=1000): # per-cycle timing of the control loop
+        self.period = period
+        self.cycles = 0
+        self.missed = 0 # cycles whose write finished after the next cycle was due
+        self.held = 0 # cycles that re-sent the last command because no new setpoint arrived
+        self.safe = 0 # cycles that sent the Driving_Ctrl_toFF safe state
+        self.errors = 0 # writes that raised
+        self.latency = deque(maxlen=history) # seconds spent in write_data_by_identifier, last `history` cycles
+        self.start_error = deque(maxlen=history) # actual - scheduled cycle start, last `history` cycles
+
+    def as_dict(self) -> Dict[str, float]: # latency percentiles, jitter and deadline-miss counters
+        latency = sorted(self.latency)
+        pick = lambda q: latency[min(len(latency) - 1, int(q * len(latency)))] if latency else 0.0
+        errors = list(self.start_error)
+        mean = sum(errors) / len(errors) if errors else 0.0
+        return {
+            "cycles": self.cycles,
+            "missed": self.missed,
+            "held": self.held,
+            "safe": self.safe,
+            "errors": self.errors,
+            "latency_p50": pick(0.50),
+            "latency_p99": pick(0.99),
+            "latency_max": latency[-1] if latency else 0.0,
+            "jitter": math.sqrt(sum((e - mean) ** 2 for e in errors) / len(errors)) if errors else 0.0
+        }
+
+
+class FoxPiControlLoop:
+
+    def __init__(self, writer: FoxPiWriteDID, source: Union[Callable[[], Optional[Sequence[float]]], "queue.Queue"], period=0.02,
+                 on_late="hold", hold_limit=0.1, safe_on_stop=True, spin=0.001, max_errors: Optional[int] = 5):
+        # source: callable returning the 14 Driving_Ctrl setpoints (or None when there is nothing new), or a queue.Queue of setpoints
+        # on_late: "hold" re-sends the last command for up to hold_limit seconds before falling back to the safe state, "safe" falls back at once
+        # max_errors: consecutive failed writes that stop the loop with the last write error (None = never stop)
+        if on_late not in ("hold", "safe"):
+            raise ValueError(f"on_late must be 'hold' or 'safe', not {on_late!r}")
+        self.writer = writer
+        self.source = source
+        self.period = period
+        self.on_late = on_late
+        self.hold_limit = hold_limit
+        self.safe_on_stop = safe_on_stop
+        self.spin = spin # busy-wait the last `spin` seconds before each cycle for a steadier start time
+        self.max_errors = max_errors
+        self.error = None # exception that stopped the loop, re-raised by stop() for a loop run with start()
+        self.encoder = DrivingCtrlEncoder()
+        self.stats = LoopStats(period)
+        self.log = FOXPI_LOG
+        self._frame = None # last good command frame (bytes), None = safe state
+        self._fresh = 0.0 # time.perf_counter() when the last setpoint arrived
+        self._failed = 0 # consecutive failed writes
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _next_setpoint(self): # newest setpoint from the source, or None if nothing new arrived this cycle
+        if isinstance(self.source, queue.Queue):
+            setpoint = None
+            try:
+                while True: # drain to the newest setpoint, stale ones are never sent
+                    setpoint = self.source.get_nowait()
+            except queue.Empty:
+                return setpoint
+        return self.source()
+
+    def cycle(self, now: float): # build and send the command for one cycle
+        setpoint = self._next_setpoint()
+        if setpoint is not None:
+            try:
+                self._frame = bytes(self.encoder.encode(setpoint)) # validated before it can reach the vehicle
+                self._fresh = now
+            except (ValueError, TypeError):
+                self.stats.errors += 1
+                self._frame = None # a bad setpoint never holds an older command
+        if setpoint is None and self._frame is not None:
+            late = now - self._fresh
+            if self.on_late == "safe" or late > self.hold_limit:
+                self._frame = None
+            else:
+                self.stats.held += 1
+        frame = self._frame if self._frame is not None else DRIVING_CTRL_FF
+        if frame is DRIVING_CTRL_FF:
+            self.stats.safe += 1
+        start = time.perf_counter()
+        try:
+            self.writer.write(0x1001, frame)
+            self._failed = 0
+        except Exception as e:
+            self.stats.errors += 1
+            self._failed += 1
+            self.log.error("FoxPiControlLoop", "Driving_Ctrl write failed (%d in a row): %s", self._failed, e)
+            if self.max_errors is not None and self._failed >= self.max_errors:
+                raise
+        finally:
+            self.stats.latency.append(time.perf_counter() - start)
+
+    def run(self, duration: float = None): # run the loop in the calling thread until stop() or duration seconds
+        self.writer.ensure_unlocked() # session entry and seed/key happen once, before the first cycle
+        start = time.perf_counter()
+        deadline = start
+        error = None
+        self._failed = 0
+        try:
+            while not self._stop.is_set():
+                now = time.perf_counter()
+                if duration is not None and now - start >= duration:
+                    break
+                if deadline - now > self.spin:
+                    time.sleep(deadline - now - self.spin)
+                while time.perf_counter() < deadline:
+                    pass
+                now = time.perf_counter()
+                self.stats.start_error.append(now - deadline)
+                self.cycle(now)
+                self.stats.cycles += 1
+                deadline += self.period
+                finished = time.perf_counter()
+                if finished > deadline: # overran into the next cycle: skip the slots already missed, stay on the grid
+                    skipped = math.floor((finished - deadline) / self.period) + 1
+                    self.stats.missed += skipped
+                    deadline += skipped * self.period
+        except BaseException as e:
+            error = self.error = e
+            raise
+        finally:
+            if self.safe_on_stop:
+                self._safe_state(error)
+
+    def _run_background(self):
+        try:
+            self.run()
+        except Exception: # kept in self.error and raised again by stop()
+            pass
+
+    def _safe_state(self, error: Optional[BaseException]): # send the safe state on the way out without hiding the error that stopped the loop
+        try:
+            self.writer.write(0x1001, DRIVING_CTRL_FF)
+        except Exception as e:
+            self.stats.errors += 1
+            if error is None:
+                raise
+            self.log.error("FoxPiControlLoop", "safe state write failed while stopping on %r: %s", error, e)
+
+    def start(self): # run the loop in a background thread
+        if self._thread is None:
+            self._stop.clear()
+            self.error = None
+            self._thread = threading.Thread(target=self._run_background, name="FoxPi-Driving_Ctrl", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self): # stop the loop (the safe state is sent on the way out when safe_on_stop is set); raises the error that ended a background loop
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self._stop.clear()
+        if thread is not None and self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    @property
+    def running(self) -> bool: # False once a background loop stopped, e.g. after max_errors failed writes
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.stop()
+        except Exception as e:
+            if exc is None:
+                raise
+            self.log.error("FoxPiControlLoop", "loop stopped on %r while the with block raised: %s", e, exc)
@@ -0,0 +1,135 @@
+from udsoncan import DynamicDidDefinition, Request, services
+from udsoncan.exceptions import UnexpectedResponseException
+from FoxPi_signals import SIGNAL_TABLE, DIDSpec, DecodePlan, FoxPiRecord, Signal
+from FoxPi_log import FOXPI_LOG, Hex
+
+from typing import Dict, Iterable, List, Tuple, Union
+import struct
+
+
+# Composite DIDs defined on the ECU with DynamicallyDefineDataIdentifier (0x2C, defineByIdentifier): only the bytes that
+# hold the wanted signals are copied from their source DIDs into one dynamic DID, so a controller reads one short DID per
+# cycle instead of several full ones. The decoder of the composite DID is compiled from the same signal table, with every
+# signal moved to its position in the composite payload:
+#   with FoxPiDynamicDID(client, ["VehicleSpeed", "YawRate", "LF_WhlSpeed", "0x1010.TMSpd"]) as composite:
+#       values = composite.read()
+# Signal names are the FoxPiReadDID decoder keys; a name used by several DIDs is qualified as "0x1002.Name" or "FoxPi_Motion_Status.Name".
+# The definition is cleared on the ECU when the with block (or close()) ends.
+
+DYNAMIC_DID = 0xF300 # first DID of the dynamically defined range (0xF200-0xF3FF)
+
+
+def find_signal(name: str) -> Tuple[int, Signal]: #signal name (optionally "DID." qualified) -> (source DID, Signal)
+    qualifier, _, name = name.rpartition(".")
+    matches = []
+    for did, spec in SIGNAL_TABLE.items():
+        if qualifier and qualifier not in (spec.name, hex(did), f"0x{did:04X}"):
+            continue
+        matches += [(did, signal) for signal in spec.signals if signal.name.strip() == name]
+    if not matches:
+        raise KeyError(f"no signal {name!r}" + (f" in {qualifier}" if qualifier else ""))
+    if len(matches) > 1:
+        raise KeyError(f"signal {name!r} exists in {', '.join(hex(did) for did, _ in matches)}, qualify it as 0xDDDD.{name}")
+    return matches[0]
+
+
+def byte_span(signal: Signal, payload_length: int) -> Tuple[int, int]:
+    # (first byte, end byte) holding the signal and its FF sentinel bits, widened to 1/2/4/8 bytes inside the source payload
+    # so the decoder can read the signal with one struct word from the short composite payload (a 24 bit signal takes 4 bytes)
+    ranges = [(signal.start, signal.length)] + ([signal.sentinel] if signal.sentinel else [])
+    first, end = min(start // 8 for start, _ in ranges), max((start + length + 7) // 8 for start, length in ranges)
+    width = next((w for w in (1, 2, 4, 8) if w >= end - first), end - first)
+    first = max(0, min(first, payload_length - width))
+    return first, max(end, first + width)
+
+
+def composite_layout(signals: Iterable[Union[str, Tuple[int, Signal]]], did=DYNAMIC_DID) -> Tuple[List[Tuple[int, int, int]], DIDSpec]:
+    # -> ([(source DID, 1-based position, size)] 0x2C entries in payload order, DIDSpec of the composite payload)
+    # Byte ranges of the same source DID that overlap or touch are merged into one entry.
+    chosen = list(dict.fromkeys(find_signal(signal) if isinstance(signal, str) else signal for signal in signals))
+    spans: Dict[int, List[List[int]]] = {}
+    for source, signal in chosen:
+        spans.setdefault(source, []).append(list(byte_span(signal, SIGNAL_TABLE[source].length)))
+    entries = []
+    placed = {} # (source DID, first source byte) -> byte position in the composite payload
+    length = 0
+    for source, ranges in spans.items():
+        ranges.sort()
+        merged = [ranges[0]]
+        for first, end in ranges[1:]:
+            if first <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([first, end])
+        for first, end in merged:
+            if end - first > 0xFF:
+                raise ValueError(f"{end - first} bytes of 0x{source:04X} do not fit one 0x2C entry")
+            entries.append((source, first + 1, end - first))
+            placed[(source, first)] = length
+            length += end - first
+    moved = []
+    names = [signal.name.strip() for _, signal in chosen]
+    for (source, signal), name in zip(chosen, names):
+        first = max(first for (entry, first) in placed if entry == source and first <= byte_span(signal, SIGNAL_TABLE[source].length)[0])
+        shift = (placed[(source, first)] - first) * 8 # bits the signal moves by in the composite payload
+        if names.count(name) > 1: # the same name from two DIDs, keep both fields apart
+            name = f"{name}_{source:04X}"
+        moved.append(signal._replace(name=name, start=signal.start + shift,
+                                     sentinel=(signal.sentinel[0] + shift, signal.sentinel[1]) if signal.sentinel else None))
+    return entries, DIDSpec(f"FoxPi_Dynamic_{did:04X}", length, moved)
+
+
+class FoxPiDynamicDID:
+
+    def __init__(self, client, signals: Iterable[Union[str, Tuple[int, Signal]]], did=DYNAMIC_DID, records=False): # client: udsoncan Client (or FoxPiChannel)
+        self.client = client
+        self.did = did
+        self.records = records # True: read() returns a FoxPiRecord of the composite DID instead of a dict
+        self.entries, self.spec = composite_layout(signals, did)
+        self.plan = DecodePlan(did, self.spec) # decoder of the composite payload, built from the relocated signals
+        self.defined = False
+        self.log = FOXPI_LOG
+
+    @property
+    def length(self) -> int: #composite payload length in bytes
+        return self.spec.length
+
+    def define(self): #send the 0x2C defineByIdentifier request (clearing an earlier definition of the DID first)
+        definition = DynamicDidDefinition()
+        for source, position, size in self.entries:
+            definition.add(source_did=source, position=position, memorysize=size)
+        if self.defined:
+            self.clear()
+        self.client.dynamically_define_did(self.did, definition)
+        self.defined = True
+        self.log.debug("FoxPiDynamicDID", "\033[33mdefined\033[0m 0x%04X: %d bytes from %s", self.did, self.length, Hex([source for source, _, _ in self.entries]))
+        return self
+
+    def clear(self): #remove the definition from the ECU
+        if self.defined:
+            self.defined = False
+            self.client.clear_dynamically_defined_did(self.did)
+            self.log.debug("FoxPiDynamicDID", "\033[33mcleared\033[0m 0x%04X", self.did)
+
+    def read_view(self) -> memoryview: #composite byte data as a memoryview over the response payload
+        response = self.client.send_request(Request(services.ReadDataByIdentifier, data=struct.pack(">H", self.did)))
+        view = memoryview(response.data)
+        if len(view) < 2 + self.length or struct.unpack_from(">H", view)[0] != self.did:
+            raise UnexpectedResponseException(response, f"DID 0x{self.did:04X} missing or shorter than {self.length} bytes")
+        return view[2:2 + self.length]
+
+    def read(self) -> Union[Dict[str, Union[int, float, str]], FoxPiRecord]: #one read of the composite DID, decoded like the source DIDs
+        view = self.read_view()
+        return self.plan.decode_record(view) if self.records else self.plan.decode(view)
+
+    def read_into(self, target) -> int: #decode one read into a preallocated record (self.plan.new_record()) or row, returns the validity bitmask
+        return self.plan.decode_into(self.read_view(), target)
+
+    def close(self):
+        self.clear()
+
+    def __enter__(self):
+        return self.define()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,183 @@
+from doipclient import DoIPClient
+from doipclient.connectors import DoIPClientUDSConnector
+from common import get_uds_client
+from udsoncan.client import Client
+from udsoncan.exceptions import TimeoutException
+from FoxPi_read import FoxPiReadDID
+from FoxPi_DTC import FoxPiDTC
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+import csv
+import threading
+import time
+
+
+class FleetTarget(NamedTuple):
+    name: str
+    ip: str
+    logical_address: int
+    port: int = 13400 #DoIP TCP port
+    client_logical_address: int = 0x0E00 #tester address; give every connection to the same gateway its own
+
+
+class VehicleResult(NamedTuple):
+    target: FleetTarget
+    ok: bool
+    value: Any #return value of the operation when ok
+    error: Optional[BaseException]
+    elapsed: float #seconds spent on this vehicle
+
+
+def load_targets(path: str) -> List[FleetTarget]: #read "name,ip,logical_address[,port[,client_logical_address]]" lines (numbers in hex or decimal, '#' starts a comment)
+    targets = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            name, ip, *numbers = (field.strip() for field in row[:5])
+            targets.append(FleetTarget(name, ip, *(int(number, 0) for number in numbers if number)))
+    return targets
+
+
+class FoxPiVehicle:
+
+    def __init__(self, target: FleetTarget, request_timeout=4, protocol_version=3): #one DoIP + UDS client per vehicle
+        self.target = target
+        self.request_timeout = request_timeout
+        self.protocol_version = protocol_version
+        self.lock = threading.Lock() #one request at a time on this vehicle's channel
+        self.doip_client = None
+        self.client = None
+        self.reader = None
+        self.dtc = None
+        self.error = None #last connection error, None while connected
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None
+
+    def connect(self): #open the DoIP connection, routing activation and UDS client the same way read.py does
+        with self.lock:
+            self._close()
+            try:
+                self.doip_client = DoIPClient(self.target.ip, self.target.logical_address, tcp_port=self.target.port, protocol_version=self.protocol_version,
+                                              client_logical_address=self.target.client_logical_address)
+                client = Client(DoIPClientUDSConnector(self.doip_client), request_timeout=self.request_timeout, config=get_uds_client())
+                client.open()
+            except Exception as e:
+                self.error = e
+                self._close()
+                raise
+            self.client = client
+            self.reader = FoxPiReadDID(client)
+            self.dtc = FoxPiDTC(client, self.doip_client)
+            self.error = None
+
+    def disconnect(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        for closable in (self.client, self.doip_client):
+            try:
+                if closable is not None:
+                    closable.close()
+            except Exception:
+                pass
+        self.client = self.doip_client = self.reader = self.dtc = None
+
+    def run(self, operation: Callable[["FoxPiVehicle"], Any]) -> VehicleResult: #run operation(vehicle) and time it, dropping the connection on transport errors
+        start = time.perf_counter()
+        with self.lock:
+            if not self.connected:
+                return VehicleResult(self.target, False, None, ConnectionError(f"{self.target.name} is not connected: {self.error}"), 0.0)
+            try:
+                value = operation(self)
+            except (OSError, TimeoutException) as e: #the link is gone, let the reconnect thread bring it back
+                self.error = e
+                self._close()
+                return VehicleResult(self.target, False, None, e, time.perf_counter() - start)
+            except Exception as e:
+                return VehicleResult(self.target, False, None, e, time.perf_counter() - start)
+        return VehicleResult(self.target, True, value, None, time.perf_counter() - start)
+
+
+class FoxPiFleet:
+
+    def __init__(self, targets: Iterable[FleetTarget], max_workers=8, reconnect_interval=5.0, request_timeout=4, protocol_version=3): #targets from a list or load_targets(path)
+        self.vehicles = {target.name: FoxPiVehicle(target, request_timeout, protocol_version) for target in targets}
+        self.max_workers = max_workers #bounded fan-out, at most this many vehicles are talked to at once
+        self.reconnect_interval = reconnect_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="FoxPi-fleet")
+        self._stop = threading.Event()
+        self._reconnector = None
+        self._connecting = set() #vehicle names with a connect attempt queued or running
+        self._connecting_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "FoxPiFleet":
+        return cls(load_targets(path), **kwargs)
+
+    def _connect(self, vehicle: FoxPiVehicle) -> VehicleResult:
+        start = time.perf_counter()
+        try:
+            vehicle.connect()
+            return VehicleResult(vehicle.target, True, None, None, time.perf_counter() - start)
+        except Exception as e:
+            return VehicleResult(vehicle.target, False, None, e, time.perf_counter() - start)
+        finally:
+            with self._connecting_lock:
+                self._connecting.discard(vehicle.target.name)
+
+    def connect(self) -> Dict[str, VehicleResult]: #connect every vehicle in parallel and start the background reconnect thread
+        futures = {name: self._executor.submit(self._connect, vehicle) for name, vehicle in self.vehicles.items()}
+        results = {name: future.result() for name, future in futures.items()}
+        if self._reconnector is None:
+            self._stop.clear()
+            self._reconnector = threading.Thread(target=self._reconnect_loop, name="FoxPi-fleet-reconnect", daemon=True)
+            self._reconnector.start()
+        return results
+
+    def _reconnect_loop(self): #retry every disconnected vehicle each reconnect_interval seconds
+        while not self._stop.wait(self.reconnect_interval):
+            for name, vehicle in self.vehicles.items():
+                with self._connecting_lock:
+                    if vehicle.connected or name in self._connecting or self._stop.is_set():
+                        continue
+                    self._connecting.add(name)
+                self._executor.submit(self._connect, vehicle)
+
+    def run(self, operation: Callable[[FoxPiVehicle], Any]) -> Dict[str, VehicleResult]: #fan operation(vehicle) out to every vehicle and collect per-vehicle results
+        futures = {name: self._executor.submit(vehicle.run, operation) for name, vehicle in self.vehicles.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def snapshot(self, dids: Iterable[int] = None) -> Dict[str, VehicleResult]: #FoxPiReadDID.snapshot() on every vehicle
+        dids = None if dids is None else list(dids)
+        return self.run(lambda vehicle: vehicle.reader.snapshot(dids))
+
+    def read_many(self, dids: Iterable[int]) -> Dict[str, VehicleResult]: #raw byte data of the DIDs from every vehicle
+        dids = list(dids)
+        return self.run(lambda vehicle: vehicle.reader.read_many(dids))
+
+    def Read_DTCs(self) -> Dict[str, VehicleResult]: #FoxPiDTC.Read_DTCs() on every vehicle
+        return self.run(lambda vehicle: vehicle.dtc.Read_DTCs())
+
+    def Clear_DTCs(self) -> Dict[str, VehicleResult]: #FoxPiDTC.Clear_DTCs() on every vehicle
+        return self.run(lambda vehicle: vehicle.dtc.Clear_DTCs())
+
+    def close(self): #stop reconnecting and close every connection
+        self._stop.set()
+        if self._reconnector is not None:
+            self._reconnector.join()
+            self._reconnector = None
+        self._executor.shutdown(wait=True)
+        for vehicle in self.vehicles.values():
+            vehicle.disconnect()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,141 @@
+from logging import DEBUG, INFO, WARNING, ERROR
+from collections import deque
+from typing import Callable, NamedTuple, Tuple
+import atexit
+import datetime
+import json
+import sys
+import threading
+import time
+
+
+# Non-blocking event log of the FoxPi classes. log.debug(msg, *args) only checks the level and appends a tuple to a bounded
+# ring buffer; %-formatting of msg with args and the terminal write happen later on a background writer thread.
+# When the buffer is full the oldest events are dropped (and counted), the caller never waits for the terminal.
+
+LEVEL_COLORS = {DEBUG: "", INFO: "", WARNING: "\033[93m", ERROR: "\033[91m"}
+
+
+class Event(NamedTuple):
+    timestamp: float #time.time() when the event was logged
+    level: int #logging.DEBUG / INFO / WARNING / ERROR
+    source: str #logging object, e.g. "FoxPiReadDID"
+    msg: str #%-format string, formatted only when the event is emitted
+    args: Tuple
+
+
+def format_text(event: Event) -> str: #the blue time stamp + message line of the original debug_print
+    message = event.msg % event.args if event.args else event.msg
+    color = LEVEL_COLORS.get(event.level, "")
+    reset = "\033[0m" if color else ""
+    return f"\033[34m{datetime.datetime.fromtimestamp(event.timestamp)}\033[0m: {color}{message}{reset}"
+
+
+def format_json(event: Event) -> str: #one JSON object per line for log collectors
+    return json.dumps({"time": event.timestamp, "level": event.level, "source": event.source,
+                       "message": event.msg % event.args if event.args else event.msg}, default=str)
+
+
+class Hex:
+
+    def __init__(self, value): #lazy hex rendering of a DID, a DID list or bytes, done by the writer thread
+        self.value = value
+
+    def __str__(self):
+        if isinstance(self.value, int):
+            return hex(self.value)
+        if isinstance(self.value, (bytes, bytearray, memoryview)):
+            return bytes(self.value).hex()
+        return str([hex(v) for v in self.value])
+
+
+class FoxPiLog:
+
+    def __init__(self, level=INFO, capacity=4096, stream=None, formatter: Callable[[Event], str] = format_text, interval=0.05):
+        # stream: file object the writer thread writes to (sys.stdout at write time when None)
+        # interval: seconds the writer sleeps between drains; ERROR events wake it at once
+        self.level = level
+        self.capacity = capacity
+        self.stream = stream
+        self.formatter = formatter
+        self.interval = interval
+        self.dropped = 0 # events overwritten before the writer got to them
+        self._events = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._drain_lock = threading.Lock() # the writer thread and flush() never interleave their lines
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def set_level(self, level):
+        self.level = level
+
+    def enabled(self, level) -> bool: #check before building expensive arguments
+        return level >= self.level
+
+    def log(self, level, source: str, msg: str, *args): #queue one event; nothing is formatted here
+        if level < self.level:
+            return
+        if len(self._events) == self.capacity:
+            self.dropped += 1
+        self._events.append((time.time(), level, source, msg, args)) # plain tuple, wrapped into an Event by the writer
+        if self._thread is None:
+            self._start()
+        if level >= ERROR:
+            self._wake.set()
+
+    def debug(self, source: str, msg: str, *args):
+        if DEBUG >= self.level:
+            self.log(DEBUG, source, msg, *args)
+
+    def info(self, source: str, msg: str, *args):
+        if INFO >= self.level:
+            self.log(INFO, source, msg, *args)
+
+    def warning(self, source: str, msg: str, *args):
+        self.log(WARNING, source, msg, *args)
+
+    def error(self, source: str, msg: str, *args):
+        self.log(ERROR, source, msg, *args)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="FoxPi-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self):
+        with self._drain_lock:
+            self._write()
+
+    def _write(self):
+        lines = []
+        while True:
+            try:
+                event = self._events.popleft()
+            except IndexError:
+                break
+            event = Event._make(event)
+            try:
+                lines.append(self.formatter(event))
+            except Exception as e: # a bad format string must not kill the writer
+                lines.append(f"{event.msg!r} {event.args!r}: {e}")
+        if lines:
+            stream = self.stream or sys.stdout
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._drain()
+
+    def flush(self): #write every queued event now, e.g. before printing results in an interactive script
+        self._drain()
+
+    def events(self):
+        return [Event._make(event) for event in self._events.copy()] #events not yet written, oldest first
+
+
+FOXPI_LOG = FoxPiLog() # shared by every FoxPi class; scripts raise it to DEBUG to see each request
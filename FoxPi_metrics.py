@@ -0,0 +1,214 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import bisect
+import threading
+import time
+
+
+# Per-exchange timing of every UDS request sent through a udsoncan Client.
+# instrument(client) wraps client.conn.send / wait_frame, so FoxPiReadDID, FoxPiWriteDID, FoxPiDTC and FoxPiTP are all covered
+# without changes. With the DoIP connector send() returns once the gateway acknowledged the diagnostic message, which splits
+# every exchange into phases:
+#   transport : send() called -> DoIP diagnostic message ack received
+#   ecu       : ack -> first UDS response (a 0x78 response pending counts as the first response)
+#   pending   : first response -> final response, only for exchanges that got 0x78 response pending
+#   total     : send() called -> final response
+# Decoding time of the FoxPiReadDID objects passed to attach() goes to the "decode" phase.
+
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # seconds
+
+RESPONSE_PENDING = 0x78
+
+
+class Exchange(NamedTuple):
+    service: int #request service id
+    did: Optional[int] #DID of 0x22/0x2E requests, None for other services and multi-DID reads
+    start: float #time.perf_counter() when send() was called
+    acked: float #send() returned (DoIP ack)
+    first: Optional[float] #first response frame, None without response
+    complete: Optional[float] #final response frame, None without response
+    pending: int #0x78 response pending frames received
+    response_code: Optional[int] #NRC of a negative final response, None when positive
+    outcome: str #"ok", "nrc", "timeout" or "no_response" (suppressed positive response)
+
+
+class FoxPiHistogram:
+
+    def __init__(self, buckets=BUCKETS): #fixed upper bounds in seconds, plus +Inf
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float: #upper bound of the bucket holding the q-quantile
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target and seen:
+                return bound
+        return 0.0
+
+
+class FoxPiMetrics:
+
+    def __init__(self, buckets=BUCKETS, sinks: Optional[List[Callable[[Exchange], None]]] = None):
+        # sinks: extra callables sink(exchange) told about every finished exchange, e.g. a logger or a tracing exporter
+        self.buckets = buckets
+        self.sinks = list(sinks or [])
+        self.histograms: Dict[Tuple[str, str, str], FoxPiHistogram] = {} # (service, did, phase) -> histogram
+        self.requests: Dict[Tuple[str, str, str], int] = {} # (service, did, outcome) -> count
+        self.pending: Dict[Tuple[str, str], int] = {} # (service, did) -> 0x78 response pending frames
+        self._cache = {} # (service, did) -> (labels, transport, ecu, pending, total histograms)
+        self._lock = threading.Lock() # several clients (fleet, channel threads) may share one metrics object
+        self._server = None
+
+    def _histogram(self, service: str, did: str, phase: str) -> FoxPiHistogram:
+        histogram = self.histograms.get((service, did, phase))
+        if histogram is None:
+            histogram = self.histograms[(service, did, phase)] = FoxPiHistogram(self.buckets)
+        return histogram
+
+    def _series(self, service: int, did: Optional[int]): #labels and histograms of one (service, DID), built once
+        series = self._cache.get((service, did))
+        if series is None:
+            labels = (f"0x{service:02X}", "" if did is None else f"0x{did:04X}")
+            series = self._cache[(service, did)] = (labels, *(self._histogram(*labels, phase) for phase in ("transport", "ecu", "pending", "total")))
+        return series
+
+    def record(self, exchange: Exchange): #account one finished exchange and hand it to the sinks
+        with self._lock:
+            labels, transport, ecu, pending, total = self._series(exchange.service, exchange.did)
+            key = labels + (exchange.outcome,)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            transport.observe(exchange.acked - exchange.start)
+            if exchange.first is not None:
+                ecu.observe(exchange.first - exchange.acked)
+                total.observe(exchange.complete - exchange.start)
+                if exchange.pending:
+                    self.pending[labels] = self.pending.get(labels, 0) + exchange.pending
+                    pending.observe(exchange.complete - exchange.first)
+        for sink in self.sinks:
+            sink(exchange)
+
+    def record_decode(self, did: int, seconds: float): #decode time of one DID payload (FoxPiReadDID.decode)
+        with self._lock:
+            self._histogram("0x22", f"0x{did:04X}", "decode").observe(seconds)
+
+    def attach(self, *readers): #time the decoding of the given FoxPiReadDID objects
+        for reader in readers:
+            reader.metrics = self
+        return self
+
+    def instrument(self, client): #wrap client.conn.send / wait_frame of a udsoncan Client (or FoxPiChannel) to time every exchange
+        conn = client.conn
+        send, wait_frame = conn.send, conn.wait_frame
+        state = {"exchange": None} # open exchange: [service, did, start, acked, first, pending]
+        clock = time.perf_counter
+
+        def finish(complete, code, outcome):
+            service, did, start, acked, first, pending = state["exchange"]
+            state["exchange"] = None
+            self.record(Exchange(service, did, start, acked, first, complete, pending, code, outcome))
+
+        def timed_send(payload, *args, **kwargs):
+            if state["exchange"] is not None: # the last request got no response (suppressed positive response)
+                finish(None, None, "no_response")
+            start = clock()
+            data = payload.get_payload() if hasattr(payload, "get_payload") else payload
+            did = (data[1] << 8 | data[2]) if data[0] in (0x22, 0x2E) and (len(data) == 3 or data[0] == 0x2E) else None
+            try:
+                return send(payload, *args, **kwargs)
+            finally:
+                state["exchange"] = [data[0], did, start, clock(), None, 0]
+
+        def timed_wait_frame(*args, **kwargs):
+            try:
+                frame = wait_frame(*args, **kwargs)
+            except Exception:
+                if state["exchange"] is not None:
+                    finish(None, None, "timeout")
+                raise
+            now = clock()
+            exchange = state["exchange"]
+            if exchange is None:
+                return frame
+            if frame is None:
+                finish(None, None, "timeout")
+                return frame
+            if exchange[4] is None:
+                exchange[4] = now
+            if len(frame) >= 3 and frame[0] == 0x7F and frame[2] == RESPONSE_PENDING:
+                exchange[5] += 1 # udsoncan keeps waiting for the final response
+            elif frame[0] == 0x7F:
+                finish(now, frame[2] if len(frame) >= 3 else None, "nrc")
+            else:
+                finish(now, None, "ok")
+            return frame
+
+        conn.send = timed_send
+        conn.wait_frame = timed_wait_frame
+        return client
+
+    def uninstrument(self, client): #remove the wrappers installed by instrument()
+        for name in ("send", "wait_frame"):
+            client.conn.__dict__.pop(name, None)
+        return client
+
+    def prometheus(self) -> str: #all metrics in the Prometheus text exposition format
+        lines = ["# HELP foxpi_uds_request_duration_seconds UDS exchange time by phase",
+                 "# TYPE foxpi_uds_request_duration_seconds histogram"]
+        with self._lock:
+            for (service, did, phase), histogram in sorted(self.histograms.items()):
+                if not histogram.count:
+                    continue
+                labels = f'service="{service}",did="{did}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'foxpi_uds_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'foxpi_uds_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"foxpi_uds_request_duration_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"foxpi_uds_request_duration_seconds_count{{{labels}}} {histogram.count}")
+            lines += ["# HELP foxpi_uds_requests_total UDS exchanges by outcome", "# TYPE foxpi_uds_requests_total counter"]
+            for (service, did, outcome), count in sorted(self.requests.items()):
+                lines.append(f'foxpi_uds_requests_total{{service="{service}",did="{did}",outcome="{outcome}"}} {count}')
+            lines += ["# HELP foxpi_uds_response_pending_total NRC 0x78 response pending frames received",
+                      "# TYPE foxpi_uds_response_pending_total counter"]
+            for (service, did), count in sorted(self.pending.items()):
+                lines.append(f'foxpi_uds_response_pending_total{{service="{service}",did="{did}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="0.0.0.0"): #serve prometheus() on http://host:port/metrics from a background thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # no access log on stderr
+                pass
+
+        if self._server is None:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="FoxPi-metrics", daemon=True).start()
+        return self._server
+
+    def close(self): #stop the HTTP endpoint
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,215 @@
+from udsoncan import Response
+from udsoncan.exceptions import NegativeResponseException, TimeoutException
+from FoxPi_read import FoxPiReadDID, FOXPI_DIDS
+from FoxPi_sampler import DIDStats, FoxPiSampler, Sample
+from FoxPi_channel import FoxPiChannel
+from FoxPi_log import FOXPI_LOG, Hex
+
+from typing import Callable, Dict, Iterable, Iterator, Optional
+import contextlib
+import threading
+import time
+
+
+# ReadDataByPeriodicIdentifier (0x2A) streaming: one request starts the ECU pushing 0x6A <periodic id> <DID data> messages at a
+# slow/medium/fast rate, so the tester only listens instead of polling with 0x22 request/response pairs.
+# Periodic identifiers are one byte; the ECU serves DID 0xF2xx as periodic id xx. The status DIDs are not in that range, so by
+# default the low byte of the DID is used (0x1002 -> 0x02) and periodic_ids maps DIDs whose ECU alias differs.
+# While streaming, the stream reads every frame of the client's connection: do not send other requests that expect a response
+# (a TesterPresent with suppressed positive response is fine) until stop(). The 0x2A requests hold the FoxPiChannel lock when
+# the reader's client is a channel. Only the thread iterating samples() reads the stream: stop() from another thread ends the
+# iteration and that thread tells the ECU to stop sending, so the stop response is never taken by two readers.
+# ECUs or gateways that reject 0x2A fall back to polling the same DIDs with FoxPiSampler at the nominal rate.
+
+RATES = {"slow": 0x01, "medium": 0x02, "fast": 0x03} # 0x2A transmission modes
+STOP_SENDING = 0x04
+RATE_PERIODS = {"slow": 1.0, "medium": 0.1, "fast": 0.02} # nominal seconds between messages, ECU specific; used for the statistics and the polling fallback
+
+FALLBACK_NRCS = (0x11, 0x12, 0x13, 0x22, 0x31, 0x7E, 0x7F) # not supported / out of range / conditions not correct / not in this session
+RESPONSE_PENDING = 0x78
+
+
+def periodic_id(did: int) -> int: #one byte periodic identifier the ECU transmits a DID under
+    return did & 0xFF
+
+
+class FoxPiPeriodic:
+
+    def __init__(self, reader: FoxPiReadDID, dids: Iterable[int], rate="fast", periodic_ids: Optional[Dict[int, int]] = None, decode=True,
+                 period: Optional[float] = None, fallback=True, response_timeout=2.0, clock=time.monotonic):
+        # periodic_ids: {did: periodic identifier} overrides of periodic_id(); period: actual ECU period of the rate when known
+        # fallback: poll with FoxPiSampler when the ECU rejects 0x2A, raise NegativeResponseException / TimeoutException otherwise
+        if rate not in RATES:
+            raise ValueError(f"rate must be one of {', '.join(RATES)}")
+        self.reader = reader
+        self.dids = list(dids)
+        self.rate = rate
+        self.decode = decode
+        self.period = period or RATE_PERIODS[rate]
+        self.fallback = fallback
+        self.response_timeout = response_timeout
+        self.clock = clock
+        self.periodic_ids = {did: (periodic_ids or {}).get(did, periodic_id(did)) for did in self.dids}
+        self._dids = {pid: did for did, pid in self.periodic_ids.items()} # periodic identifier -> DID
+        if len(self._dids) != len(self.dids):
+            raise ValueError("two DIDs map to the same periodic identifier")
+        self.stats = {did: DIDStats(did, 1.0 / self.period) for did in self.dids}
+        self.sampler: Optional[FoxPiSampler] = None # set when streaming was rejected and the DIDs are polled instead
+        self.streaming = False # the ECU was told to transmit and has not been told to stop
+        self.requests = 0 # 0x2A requests sent (polling requests are counted by the sampler)
+        self.unexpected = 0 # frames received while streaming that were no periodic message of our DIDs
+        self.error = None # negative response or timeout that caused the fallback
+        self.log = FOXPI_LOG
+        self._running = False
+        self._thread = None
+        self._owner = None # thread inside samples()' streaming loop
+        self._done = threading.Event() # cleared while that loop runs
+        self._done.set()
+
+    @property
+    def conn(self):
+        return self.reader.client.conn
+
+    @property
+    def polling(self) -> bool:
+        return self.sampler is not None
+
+    def _channel_lock(self): #the FoxPiChannel lock, so other threads' requests on the channel do not interleave with a 0x2A request
+        client = self.reader.client
+        return client.lock if isinstance(client, FoxPiChannel) else contextlib.nullcontext()
+
+    def _request(self, payload: bytes) -> bytes: #send one 0x2A request, return its final response; periodic messages in between are consumed
+        with self._channel_lock():
+            try:
+                return self._exchange(payload)
+            finally:
+                if isinstance(self.reader.client, FoxPiChannel):
+                    self.reader.client.touch()
+
+    def _exchange(self, payload: bytes) -> bytes:
+        self.conn.send(payload)
+        self.requests += 1
+        deadline = self.clock() + self.response_timeout
+        while True:
+            frame = self.conn.wait_frame(timeout=max(0.001, deadline - self.clock()), exception=True)
+            if frame[:1] == b"\x6A" and len(frame) == 1:
+                return frame
+            if frame[:2] == b"\x7F\x2A":
+                if len(frame) >= 3 and frame[2] == RESPONSE_PENDING:
+                    deadline = self.clock() + self.response_timeout
+                    continue
+                return frame
+            self._sample(frame, self.clock()) # an already scheduled periodic message
+
+    def start(self): #ask the ECU to transmit the DIDs at the rate; falls back to polling when allowed
+        if self.streaming or self.polling:
+            return self
+        payload = bytes((0x2A, RATES[self.rate])) + bytes(self.periodic_ids[did] for did in self.dids)
+        try:
+            frame = self._request(payload)
+        except TimeoutException as e:
+            self._fall_back(e)
+            return self
+        if frame[0] == 0x7F:
+            error = NegativeResponseException(Response.from_payload(frame))
+            if frame[2] not in FALLBACK_NRCS:
+                raise error
+            self._fall_back(error)
+            return self
+        self.streaming = True
+        self.log.debug("FoxPiPeriodic", "\033[33mstreaming\033[0m %s at %s rate", Hex(self.dids), self.rate)
+        return self
+
+    def _fall_back(self, error):
+        if not self.fallback:
+            raise error
+        self.error = error
+        self.sampler = FoxPiSampler(self.reader, {did: 1.0 / self.period for did in self.dids}, self.decode, clock=self.clock)
+        self.stats = self.sampler.stats
+        self.log.warning("FoxPiPeriodic", "0x2A rejected (%s), polling %s instead", error, Hex(self.dids))
+
+    def stop_transmission(self): #tell the ECU to stop sending the periodic identifiers of this stream
+        if not self.streaming:
+            return
+        self.streaming = False
+        try:
+            self._request(bytes((0x2A, STOP_SENDING)) + bytes(self.periodic_ids[did] for did in self.dids))
+        except TimeoutException as e:
+            self.log.error("FoxPiPeriodic", "stop sending: %s", e)
+        self.conn.empty_rxqueue() # messages the ECU sent before it processed the stop must not be taken as the next response
+
+    def _sample(self, frame: bytes, timestamp: float) -> Optional[Sample]:
+        did = self._dids.get(frame[1]) if len(frame) >= 2 and frame[0] == 0x6A else None
+        if did is None or len(frame) < 2 + FOXPI_DIDS[did][1]:
+            self.unexpected += 1
+            return None
+        byte_data = frame[2:2 + FOXPI_DIDS[did][1]]
+        self.stats[did].add(timestamp)
+        for observer in self.reader.observers:
+            observer(did, 0, byte_data) # direction 0 = read, recorded like a polled read
+        return Sample(timestamp, did, self.reader.decode(did, byte_data) if self.decode else byte_data)
+
+    def samples(self, duration: float = None) -> Iterator[Sample]: #start the stream and yield every message as a Sample; the ECU is told to stop when the iteration ends
+        self.start()
+        if self.polling:
+            yield from self.sampler.samples(duration)
+            return
+        self._running = True
+        self._owner = threading.current_thread()
+        self._done.clear()
+        start = self.clock()
+        try:
+            while self._running:
+                now = self.clock()
+                if duration is not None and now - start >= duration:
+                    break
+                timeout = self.response_timeout if duration is None else min(self.response_timeout, start + duration - now)
+                frame = self.conn.wait_frame(timeout=timeout, exception=False)
+                if frame is None:
+                    continue
+                sample = self._sample(frame, self.clock())
+                if sample is not None:
+                    yield sample
+        finally:
+            self._running = False
+            try:
+                self.stop_transmission()
+            finally:
+                self._owner = None
+                self._done.set()
+
+    __iter__ = samples
+
+    def listen(self, callback: Callable[[Sample], None], duration: float = None) -> threading.Thread: #call callback(sample) for every message from a background thread
+        def run():
+            for sample in self.samples(duration):
+                callback(sample)
+        self._thread = threading.Thread(target=run, name="FoxPi-periodic", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self): #end samples() / listen(); the ECU is told to stop sending by the thread iterating samples()
+        self._running = False
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self._owner is threading.current_thread(): # called from inside the loop (e.g. a listen() callback), its finally sends the stop
+            return
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        elif not self._done.is_set():
+            # the loop notices within one wait_frame timeout; a consumer holding the generator without iterating sends the
+            # stop when it resumes or closes it
+            if not self._done.wait(2 * self.response_timeout):
+                self.log.warning("FoxPiPeriodic", "samples() is not being iterated, the stream stops when its consumer resumes")
+            return
+        self.stop_transmission() # started without samples(), nobody else reads the connection
+
+    def report(self) -> Dict[int, Dict[str, float]]: #per DID achieved rate and jitter, like FoxPiSampler.report()
+        return {did: stats.as_dict() for did, stats in self.stats.items()}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,166 @@
+from FoxPi_signals import SIGNAL_TABLE
+from FoxPi_bulk import decode_records
+from FoxPi_record import FoxPiRecordReader, DIR_READ
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import array
+import os
+import shutil
+import sys
+import time
+import zipfile
+import numpy as np
+
+
+# Offline decoding of FoxPiRecorder logs on every core:
+#   python FoxPi_pipeline.py drive1.foxpi drive2.foxpi -o out --format npy --workers 8
+# Every log is cut into shards of about --shard-frames frames along its time index (FoxPiRecordReader.shards()); a process
+# pool scans each shard, decodes the DID reads with FoxPi_bulk.decode_records and writes one part file per DID. The parts are
+# then concatenated in time order, one part at a time, so memory stays bounded by the shard size, not the log size:
+# Logs with the same file name from different directories are told apart as out/<index>_<log>/ (index = position on the command line).
+#   npy : out/<log>/<DID name>/<signal>.npy (+ <signal>.mask.npy, True = "FF") and timestamp.npy / time.npy
+#   npz : out/<log>/<DID name>.npz holding the same arrays
+#   csv : out/<log>/<DID name>.csv, "FF" for not available signals
+# timestamp is the recording session's time.monotonic(), time the wall-clock time from the session marker (NaN when unknown).
+
+FORMATS = ("npy", "npz", "csv")
+
+
+def column_name(name: str) -> str: #signal name as a file / column name ("TMTqReq " -> "TMTqReq")
+    return name.strip()
+
+
+def decode_shard(task: Tuple[str, int, int, Optional[float], Optional[List[int]], str]) -> Dict[int, int]:
+    # worker: decode the DID reads of one shard into one .npz part per DID, returns {did: rows}
+    path, offset, stop, shift, dids, part = task
+    payloads: Dict[int, bytearray] = {}
+    timestamps: Dict[int, array.array] = {}
+    with FoxPiRecordReader(path) as reader:
+        for frame in reader.scan(offset, stop, dids):
+            spec = SIGNAL_TABLE.get(frame.did)
+            if frame.direction != DIR_READ or spec is None or len(frame.payload) != spec.length:
+                continue
+            if frame.did not in payloads:
+                payloads[frame.did] = bytearray()
+                timestamps[frame.did] = array.array("d")
+            payloads[frame.did] += frame.payload
+            timestamps[frame.did].append(frame.timestamp)
+        frame = None # drop the last memoryview before the map is closed
+    rows = {}
+    for did, data in payloads.items():
+        timestamp = np.frombuffer(timestamps[did], dtype=np.float64)
+        arrays = {"timestamp": timestamp, "time": timestamp + (np.nan if shift is None else shift)}
+        for name, column in decode_records(did, data).items():
+            arrays[column_name(name)] = np.ma.getdata(column)
+            if np.ma.isMaskedArray(column):
+                arrays[column_name(name) + ".mask"] = np.ma.getmaskarray(column)
+        np.savez(f"{part}_{did:04X}.npz", **arrays)
+        rows[did] = len(timestamp)
+    return rows
+
+
+def _write_npy(directory: str, parts: List[str], rows: int): #concatenate the arrays of the parts into one .npy per array through memory maps
+    os.makedirs(directory, exist_ok=True)
+    outputs = {}
+    at = 0
+    for part in parts:
+        with np.load(part) as arrays:
+            count = 0
+            for name in arrays.files:
+                data = arrays[name]
+                if name not in outputs:
+                    outputs[name] = np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+", dtype=data.dtype, shape=(rows,))
+                outputs[name][at:at + len(data)] = data
+                count = len(data)
+        at += count
+    for output in outputs.values():
+        output.flush()
+    return list(outputs)
+
+
+def _write_npz(path: str, parts: List[str], rows: int): #the .npy files of _write_npy stored into one uncompressed .npz
+    directory = path[:-len(".npz")] + ".tmp"
+    names = _write_npy(directory, parts, rows)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name in names:
+            archive.write(os.path.join(directory, name + ".npy"), name + ".npy")
+    shutil.rmtree(directory)
+
+
+def _write_csv(path: str, parts: List[str], did: int): #append the parts row by row, "FF" where the mask is set
+    signals = [column_name(signal.name) for signal in SIGNAL_TABLE[did].signals]
+    with open(path, "w") as f:
+        f.write(",".join(["timestamp", "time"] + signals) + "\n")
+        for part in parts:
+            with np.load(part) as arrays:
+                columns = [arrays["timestamp"].tolist(), arrays["time"].tolist()]
+                for name in signals:
+                    values = arrays[name].tolist()
+                    if name + ".mask" in arrays.files:
+                        values = ["FF" if ff else value for value, ff in zip(values, arrays[name + ".mask"].tolist())]
+                    columns.append(values)
+                f.writelines(",".join(map(str, row)) + "\n" for row in zip(*columns))
+
+
+def process(paths: Iterable[str], output: str, fmt="npy", dids: Iterable[int] = None, workers: int = None, shard_frames=100000) -> Dict[str, Dict[int, int]]:
+    # decode every log into output/<log name>/ and return {log path: {did: rows}}
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    dids = None if dids is None else sorted(dids)
+    paths = list(dict.fromkeys(paths))
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    tasks, owners = [], []
+    for log, (path, name) in enumerate(zip(paths, names)):
+        if names.count(name) > 1: # day1/drive.foxpi and day2/drive.foxpi -> 0_drive, 1_drive
+            name = f"{log}_{name}"
+        destination = os.path.join(output, name)
+        os.makedirs(os.path.join(destination, ".parts"), exist_ok=True)
+        with FoxPiRecordReader(path) as reader:
+            shards = reader.shards(shard_frames)
+        for i, (offset, stop, shift) in enumerate(shards):
+            tasks.append((path, offset, stop, shift, dids, os.path.join(destination, ".parts", f"{log:04d}_{i:06d}")))
+            owners.append((path, destination))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(decode_shard, tasks, chunksize=1))
+    totals: Dict[str, Dict[int, int]] = {}
+    parts: Dict[Tuple[str, int], List[str]] = {}
+    for task, (path, destination), rows in zip(tasks, owners, results): # shard order = time order within a log
+        for did, count in rows.items():
+            totals.setdefault(path, {})[did] = totals.get(path, {}).get(did, 0) + count
+            parts.setdefault((path, did), []).append(f"{task[5]}_{did:04X}.npz")
+    destinations = dict(owners)
+    for (path, did), files in parts.items():
+        destination = destinations[path]
+        name = SIGNAL_TABLE[did].name
+        rows = totals[path][did]
+        if fmt == "npy":
+            _write_npy(os.path.join(destination, name), files, rows)
+        elif fmt == "npz":
+            _write_npz(os.path.join(destination, name + ".npz"), files, rows)
+        else:
+            _write_csv(os.path.join(destination, name + ".csv"), files, did)
+    for destination in set(destinations.values()):
+        shutil.rmtree(os.path.join(destination, ".parts"), ignore_errors=True)
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode FoxPiRecorder logs on all cores into per-DID columnar files")
+    parser.add_argument("logs", nargs="+", help="FoxPiRecorder log files")
+    parser.add_argument("-o", "--output", default="decoded", help="output directory, one sub directory per log")
+    parser.add_argument("--format", choices=FORMATS, default="npy")
+    parser.add_argument("--dids", help="comma separated DIDs to decode, e.g. 0x1002,0x1004 (all status DIDs when omitted)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (one per core when omitted)")
+    parser.add_argument("--shard-frames", type=int, default=100000, help="frames per shard, bounds the memory of each worker")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = process(args.logs, args.output, args.format, [int(did, 0) for did in args.dids.split(",")] if args.dids else None,
+                     args.workers, args.shard_frames)
+    elapsed = time.perf_counter() - start
+    frames = sum(sum(rows.values()) for rows in totals.values())
+    for path, rows in totals.items():
+        print(f"{path}: " + ", ".join(f"{SIGNAL_TABLE[did].name} {count}" for did, count in sorted(rows.items())))
+    print(f"{frames} frames decoded in {elapsed:.2f} s ({frames / elapsed if elapsed else 0:.0f} frames/s)", file=sys.stderr)
@@ -0,0 +1,243 @@
+from udsoncan import Request, services
+from udsoncan.exceptions import TimeoutException
+from FoxPi_log import FOXPI_LOG
+
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+import struct
+import threading
+import time
+
+
+# Request policy for a udsoncan Client, installed by wrapping client.send_request (every service method goes through it):
+#  - adaptive timeouts: the P2 timeout of each request comes from the latency observed for its service and DID,
+#    p99 * multiplier + margin within [min_timeout, max_timeout], instead of one fixed value for every request; the server P2
+#    a DiagnosticSessionControl response stored in client.session_timing is set aside for each request (it would take
+#    precedence over config["p2_timeout"]) and is the fallback until enough samples are seen; the server P2* still applies
+#  - 0x78 response pending: the overall request timeout is lifted, udsoncan waits P2* per pending frame, and a request
+#    is only given up after max_pending pending frames; pending exchanges do not feed the P2 statistics
+#  - retries: idempotent requests (0x22, 0x19) that time out are sent again, at most max_retries times and only while the
+#    retry budget (retry_ratio tokens per request, capped) allows, so retries cannot multiply the load of a dead link
+#  - circuit breaker: failure_threshold consecutive failed requests (a timeout or transport error left after the retries)
+#    open the circuit; requests then fail at once with CircuitOpen while a background thread reconnects (when it has a
+#    reconnect callable or DoIP client) and probes with TesterPresent until the ECU answers again
+#   policy = FoxPiRequestPolicy(client, doip_client).install()
+#   policy.on_reconnect.append(writer.reset_session)
+
+IDEMPOTENT_SERVICES = (0x22, 0x19) # safe to send twice
+TRANSPORT_ERRORS = (TimeoutException, ConnectionError, OSError)
+
+
+class CircuitOpen(ConnectionError): # the vehicle is considered unreachable, the request was not sent
+    pass
+
+
+class LatencyTracker:
+
+    def __init__(self, window=200, refresh=20): #latency samples in seconds of the last window exchanges, percentiles recomputed every refresh samples
+        self.samples = deque(maxlen=window)
+        self.refresh = refresh
+        self.count = 0
+        self._percentiles = None
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        if self.count % self.refresh == 0:
+            self._percentiles = None
+
+    def percentile(self, q: float) -> float:
+        if self._percentiles is None:
+            self._percentiles = sorted(self.samples)
+        ordered = self._percentiles
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FoxPiRequestPolicy:
+
+    def __init__(self, client, doip_client=None, reconnect: Optional[Callable[[], None]] = None, min_samples=20, quantile=0.99,
+                 multiplier=2.0, margin=0.010, min_timeout=0.025, max_timeout: Optional[float] = None, max_pending=20,
+                 max_retries=2, retry_ratio=0.1, retry_burst=10.0, failure_threshold=3, reconnect_interval=1.0, max_reconnect_interval=10.0):
+        # client: udsoncan Client or FoxPiChannel; reconnect(): re-open the transport, doip_client.reconnect() by default,
+        # with neither the open circuit is closed by the TesterPresent probe alone
+        # max_timeout: upper bound of the adaptive P2, the client's p2_timeout when None
+        self.client = getattr(client, "client", client) # the udsoncan Client behind a FoxPiChannel
+        self.doip_client = doip_client
+        self.reconnect = reconnect or (doip_client.reconnect if doip_client is not None else None)
+        self.default_timeout = self.client.config["p2_timeout"]
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.margin = margin
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout or self.default_timeout
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_ratio = retry_ratio
+        self.retry_burst = retry_burst
+        self.failure_threshold = failure_threshold
+        self.reconnect_interval = reconnect_interval
+        self.max_reconnect_interval = max_reconnect_interval
+        self.on_reconnect: List[Callable[[], None]] = [] # called after the circuit closed again, e.g. FoxPiWriteDID.reset_session
+        self.latency: Dict[Tuple[int, Optional[int]], LatencyTracker] = {} # (service, DID) and (service, None) -> samples
+        self.counters = {"requests": 0, "timeouts": 0, "retries": 0, "retries_denied": 0, "pending": 0, "rejected": 0, "reconnects": 0}
+        self.open = False # circuit state, True = failing fast
+        self.failures = 0 # consecutive failed requests
+        self.log = FOXPI_LOG
+        self._tokens = retry_burst
+        self._pending_frames = 0
+        self._send_request = None
+        self._lock = threading.Lock()
+        self._recovery = None
+        self._closed = threading.Event()
+
+    def install(self): #wrap client.send_request and take over the overall timeout and 0x78 handling
+        if self._send_request is None:
+            self._send_request = self.client.send_request
+            self._config = {name: self.client.config.get(name) for name in ("p2_timeout", "request_timeout", "nrc78_callback")}
+            self.client.config["request_timeout"] = None # P2 / P2* per frame and the pending cap bound a request instead
+            self.client.config["nrc78_callback"] = self._on_pending
+            self.client.send_request = self._request
+        return self
+
+    def uninstall(self):
+        if self._send_request is not None:
+            self.client.__dict__.pop("send_request", None)
+            self.client.config.update(self._config)
+            self._send_request = None
+        self._closed.set()
+        if self._recovery is not None:
+            self._recovery.join()
+            self._recovery = None
+
+    def _on_pending(self): #udsoncan nrc78_callback
+        self._pending_frames += 1
+        self.counters["pending"] += 1
+        if self._pending_frames > self.max_pending:
+            raise TimeoutException(f"gave up after {self.max_pending} response pending (0x78) frames")
+
+    def _tracker(self, key) -> LatencyTracker:
+        tracker = self.latency.get(key)
+        if tracker is None:
+            tracker = self.latency[key] = LatencyTracker()
+        return tracker
+
+    def timeout(self, service: int, did: Optional[int] = None) -> float: #P2 timeout for the next request of this service / DID
+        for key in ((service, did), (service, None)):
+            tracker = self.latency.get(key)
+            if tracker is not None and len(tracker.samples) >= self.min_samples:
+                return min(self.max_timeout, max(self.min_timeout, tracker.percentile(self.quantile) * self.multiplier + self.margin))
+        return self.client.session_timing.p2_server_max or self.default_timeout # what udsoncan itself would wait
+
+    def _send(self, request: Request, timeout, p2: float): #send through the unwrapped client with p2 as the P2 timeout
+        timing = self.client.session_timing
+        server_p2 = timing.p2_server_max
+        timing.p2_server_max = None # udsoncan prefers the server P2 over config["p2_timeout"]
+        self.client.config["p2_timeout"] = p2
+        try:
+            return self._send_request(request, timeout)
+        finally:
+            if timing.p2_server_max is None: # a DiagnosticSessionControl sent by this request stored the new server timing itself
+                timing.p2_server_max = server_p2
+
+    def _request(self, request: Request, timeout=-1):
+        if self.open:
+            self.counters["rejected"] += 1
+            raise CircuitOpen("vehicle unreachable, reconnecting in the background")
+        service = request.service.request_id()
+        data = request.data or b""
+        did = struct.unpack_from(">H", data)[0] if service in (0x22, 0x2E) and len(data) == 2 else None
+        with self._lock:
+            self.counters["requests"] += 1
+            self._tokens = min(self.retry_burst, self._tokens + self.retry_ratio)
+        attempt = 0
+        while True:
+            p2 = min(self.max_timeout, self.timeout(service, did) * (2 ** attempt)) # a retry gets more time
+            self._pending_frames = 0
+            start = time.perf_counter()
+            try:
+                response = self._send(request, timeout, p2)
+            except TRANSPORT_ERRORS as e:
+                if isinstance(e, TimeoutException):
+                    self.counters["timeouts"] += 1
+                    if service in IDEMPOTENT_SERVICES and attempt < self.max_retries:
+                        with self._lock:
+                            allowed = self._tokens >= 1.0
+                            if allowed:
+                                self._tokens -= 1.0
+                        if allowed:
+                            attempt += 1
+                            self.counters["retries"] += 1
+                            continue
+                        self.counters["retries_denied"] += 1
+                self._failure(e) # one failure per request, after its retries
+                raise
+            except Exception: # negative or unexpected response: the ECU is there
+                self._success()
+                raise
+            elapsed = time.perf_counter() - start
+            if response is not None and not self._pending_frames: # suppressed responses and 0x78 exchanges say nothing about P2
+                self._tracker((service, did)).add(elapsed)
+                if did is not None:
+                    self._tracker((service, None)).add(elapsed)
+            self._success()
+            return response
+
+    def _success(self):
+        self.failures = 0
+
+    def _failure(self, error):
+        with self._lock:
+            self.failures += 1
+            if self.failures < self.failure_threshold or self.open:
+                return
+            self.open = True
+        self.log.error("FoxPiRequestPolicy", "circuit open after %d failures: %s", self.failures, error)
+        if self._recovery is None or not self._recovery.is_alive():
+            self._recovery = threading.Thread(target=self._recover, name="FoxPi-reconnect", daemon=True)
+            self._recovery.start()
+
+    def probe(self) -> bool: #one TesterPresent through the unwrapped client, True when the ECU answered at all
+        try:
+            self._send(Request(services.TesterPresent, subfunction=0), -1, self.max_timeout)
+        except TRANSPORT_ERRORS:
+            return False
+        except Exception: # a negative response still proves the link works
+            pass
+        return True
+
+    def _recover(self): #reconnect with exponential backoff until a probe succeeds, then close the circuit
+        # without a reconnect callable the transport is left as it is and only probed (half-open after each backoff interval)
+        interval = self.reconnect_interval
+        while not self._closed.wait(interval):
+            try:
+                if self.reconnect is not None:
+                    self.reconnect()
+                recovered = self.probe()
+            except Exception as e:
+                self.log.warning("FoxPiRequestPolicy", "reconnect failed: %s", e)
+                recovered = False
+            if recovered:
+                with self._lock:
+                    self.open = False
+                    self.failures = 0
+                self.counters["reconnects"] += 1
+                self.log.info("FoxPiRequestPolicy", "vehicle reachable again, circuit closed")
+                for callback in self.on_reconnect:
+                    callback()
+                return
+            interval = min(self.max_reconnect_interval, interval * 2)
+
+    def report(self) -> Dict[str, Dict[str, float]]: #current timeout and latency percentiles per service / DID
+        rows = {}
+        for (service, did), tracker in sorted(self.latency.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+            if tracker.samples:
+                rows[f"0x{service:02X}" + ("" if did is None else f" 0x{did:04X}")] = {
+                    "samples": tracker.count, "p50": tracker.percentile(0.5), "p99": tracker.percentile(0.99), "timeout": self.timeout(service, did)}
+        return rows
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
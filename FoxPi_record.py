@@ -0,0 +1,259 @@
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+# File layout (little endian):
+#   header  : magic "FOXPIREC", version u16, index interval u16
+#   frames  : timestamp f64 (time.monotonic), DID u16, direction u8, reserved u8, payload length u16, payload
+# Every index_interval frames the recorder appends (timestamp f64, file offset u64) to the sidecar "<file>.idx",
+# so a reader can seek by time without scanning the whole log. When a block of index_interval frames is complete (and on
+# flush / close for the open block) the DIDs it holds go to the sidecar "<file>.dids" as (block offset u64, end offset u64,
+# count u16, count x DID u16), so a DID filter skips the blocks without a wanted DID instead of scanning every frame; bytes
+# not covered by an entry (older logs, the tail of a log still being written) are scanned. A later entry of the same block
+# replaces an earlier one. Appending to an existing log keeps the index interval of its header.
+# A recorder opening the file first writes a session frame (DID 0xFFFF) holding (time.time(), time.monotonic())
+# so monotonic timestamps of each session can be mapped to wall-clock time.
+
+MAGIC = b"FOXPIREC"
+VERSION = 1
+HEADER = struct.Struct("<8sHH")
+FRAME = struct.Struct("<dHBBH")
+INDEX = struct.Struct("<dQ")
+DIDS = struct.Struct("<QQH")
+SESSION = struct.Struct("<dd")
+
+DIR_READ = 0 # response data of a ReadDataByIdentifier
+DIR_WRITE = 1 # data written with WriteDataByIdentifier
+DIR_SESSION = 2 # recorder session start marker
+SESSION_DID = 0xFFFF
+
+
+class Frame(NamedTuple):
+    timestamp: float #time.monotonic() of the recording session
+    did: int
+    direction: int
+    payload: memoryview #zero-copy view into the memory-mapped log
+
+
+class FoxPiRecorder:
+
+    def __init__(self, path: str, index_interval=1000, buffering=1 << 16): #open (or append to) a binary DID log
+        # index_interval only applies to a new log, an existing one keeps the interval in its header (shards() relies on it)
+        self.path = path
+        self._lock = threading.Lock() #reader, writer and control loop threads may record at the same time
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, "rb") as f:
+                magic, version, index_interval = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a FoxPi record file (version {VERSION})")
+        self.index_interval = index_interval
+        self._file = open(path, "ab", buffering=buffering)
+        self._index = open(path + ".idx", "ab")
+        self._dids = open(path + ".dids", "ab")
+        if new:
+            self._file.write(HEADER.pack(MAGIC, VERSION, index_interval))
+        self._offset = self._file.tell()
+        self._count = 0
+        self._block = self._offset # offset of the open index block
+        self._block_dids = set() # DIDs recorded in it
+        self.append(SESSION_DID, DIR_SESSION, SESSION.pack(time.time(), time.monotonic()))
+
+    def append(self, did: int, direction: int, payload, timestamp: float = None): #append one raw DID frame
+        with self._lock:
+            if timestamp is None: # taken under the lock so concurrent appends stay in time order (frames() stops at the first later frame)
+                timestamp = time.monotonic()
+            if self._count % self.index_interval == 0:
+                if self._count:
+                    self._write_dids()
+                self._index.write(INDEX.pack(timestamp, self._offset))
+                self._block = self._offset
+                self._block_dids = set()
+            self._block_dids.add(did)
+            self._file.write(FRAME.pack(timestamp, did, direction, 0, len(payload)))
+            self._file.write(payload)
+            self._offset += FRAME.size + len(payload)
+            self._count += 1
+
+    def _write_dids(self): #DIDs of the open block, up to the current offset
+        dids = sorted(self._block_dids)
+        self._dids.write(DIDS.pack(self._block, self._offset, len(dids)) + struct.pack(f"<{len(dids)}H", *dids))
+
+    def __call__(self, did: int, direction: int, payload): #observer interface of FoxPiReadDID / FoxPiWriteDID
+        self.append(did, direction, payload)
+
+    def attach(self, *targets): #record every DID read / write of the given FoxPiReadDID / FoxPiWriteDID objects
+        for target in targets:
+            target.observers.append(self)
+        return self
+
+    def detach(self, *targets):
+        for target in targets:
+            if self in target.observers:
+                target.observers.remove(self)
+
+    def flush(self):
+        with self._lock:
+            self._write_dids()
+            self._file.flush()
+            self._index.flush()
+            self._dids.flush()
+
+    def close(self):
+        with self._lock:
+            self._write_dids()
+            self._file.close()
+            self._index.close()
+            self._dids.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FoxPiRecordReader:
+
+    def __init__(self, path: str): #memory-map a log written by FoxPiRecorder
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.index_interval = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a FoxPi record file (version {VERSION})")
+        times, offsets = [], []
+        if os.path.exists(path + ".idx"):
+            with open(path + ".idx", "rb") as f:
+                data = f.read()
+            for timestamp, offset in INDEX.iter_unpack(data[:len(data) // INDEX.size * INDEX.size]):
+                if offset < len(self._map): #skip entries of frames not yet flushed when the map was made
+                    times.append(timestamp)
+                    offsets.append(offset)
+        blocks = {} # block offset -> (end offset, DIDs in the block)
+        if os.path.exists(path + ".dids"):
+            with open(path + ".dids", "rb") as f:
+                data = f.read()
+            at = 0
+            while at + DIDS.size <= len(data):
+                offset, end, count = DIDS.unpack_from(data, at)
+                if at + DIDS.size + 2 * count > len(data):
+                    break
+                blocks[offset] = (end, frozenset(struct.unpack_from(f"<{count}H", data, at + DIDS.size)))
+                at += DIDS.size + 2 * count
+        self._blocks = sorted((offset, min(end, len(self._map)), dids) for offset, (end, dids) in blocks.items())
+        self._block_offsets = [offset for offset, _, _ in self._blocks]
+        # Each recorder session starts with an indexed frame and may run on another monotonic clock,
+        # so split the index into runs of growing timestamps: (times, offsets, end offset of the run)
+        self._runs = []
+        first = 0
+        for i in range(1, len(times) + 1):
+            if i == len(times) or times[i] < times[i - 1]:
+                stop = offsets[i] if i < len(times) else len(self._map)
+                self._runs.append((times[first:i], offsets[first:i], stop))
+                first = i
+
+    def _scan(self, offset, stop, start, end, dids, sessions, ordered) -> Iterator[Frame]:
+        view = memoryview(self._map)
+        stop = min(stop, len(self._map))
+        while offset + FRAME.size <= stop:
+            timestamp, did, direction, _, length = FRAME.unpack_from(self._map, offset)
+            payload_at = offset + FRAME.size
+            offset = payload_at + length
+            if offset > stop: #truncated last frame of a log that is still being written
+                break
+            if direction == DIR_SESSION:
+                if sessions:
+                    yield Frame(timestamp, did, direction, view[payload_at:offset])
+                continue
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                if ordered:
+                    break #timestamps only grow until the end of this run
+                continue
+            if dids is not None and did not in dids:
+                continue
+            yield Frame(timestamp, did, direction, view[payload_at:offset])
+
+    def _ranges(self, offset: int, stop: int, dids) -> Iterator[Tuple[int, int]]:
+        #byte ranges of [offset, stop) to scan for frames of dids, without the blocks the .dids sidecar says hold none of them
+        if dids is None or not self._blocks:
+            yield offset, stop
+            return
+        i = bisect.bisect_left(self._block_offsets, offset)
+        while offset < stop:
+            if i < len(self._blocks) and self._block_offsets[i] == offset:
+                _, end, block_dids = self._blocks[i]
+                i += 1
+                if end > offset and block_dids.isdisjoint(dids):
+                    offset = end
+                    continue
+            end = min(self._block_offsets[i], stop) if i < len(self._blocks) else stop # up to the next block start
+            yield offset, end
+            offset = end
+
+    def frames(self, start: float = None, end: float = None, dids: Iterable[int] = None, sessions=False) -> Iterator[Frame]:
+        #yield frames with start <= timestamp < end, optionally only the given DIDs, payloads as zero-copy memoryviews
+        dids = None if dids is None else set(dids)
+        wanted = dids if dids is None or not sessions else dids | {SESSION_DID} # DIDs whose blocks are worth scanning
+        if not self._runs: #no index: scan everything
+            yield from self._scan(HEADER.size, len(self._map), start, end, dids, sessions, False)
+            return
+        if self._runs[0][1][0] > HEADER.size: #frames before the first index entry
+            yield from self._scan(HEADER.size, self._runs[0][1][0], start, end, dids, sessions, False)
+        for times, offsets, stop in self._runs:
+            i = 0 if start is None else max(0, bisect.bisect_right(times, start) - 1)
+            j = len(times) if end is None else bisect.bisect_left(times, end) # blocks starting at or after end hold no wanted frame
+            stop = offsets[j] if j < len(offsets) else stop
+            for offset, range_stop in self._ranges(offsets[i], stop, wanted):
+                yield from self._scan(offset, range_stop, start, end, dids, sessions, True)
+
+    __iter__ = frames
+
+    def scan(self, offset: int, stop: int, dids: Iterable[int] = None) -> Iterator[Frame]: #frames (no session markers) between two frame offsets, e.g. one of shards()
+        dids = None if dids is None else set(dids)
+        for offset, range_stop in self._ranges(offset, stop, dids):
+            yield from self._scan(offset, range_stop, None, None, dids, False, False)
+
+    def _clock_shift(self, offset: int) -> Optional[float]: #time.time() - time.monotonic() of the session starting at offset, None when there is no session frame
+        timestamp, did, direction, _, length = FRAME.unpack_from(self._map, offset)
+        if direction != DIR_SESSION or length != SESSION.size:
+            return None
+        wall, monotonic = SESSION.unpack_from(self._map, offset + FRAME.size)
+        return wall - monotonic
+
+    def shards(self, frames_per_shard=100000) -> List[Tuple[int, int, Optional[float]]]:
+        # split the log into (offset, stop, clock shift) byte ranges of about frames_per_shard frames along the index, for parallel
+        # decoding with scan(); a shard never spans two sessions, clock shift maps its timestamps to wall-clock time (None = unknown)
+        if not self._runs:
+            return [(HEADER.size, len(self._map), self._clock_shift(HEADER.size) if len(self._map) >= HEADER.size + FRAME.size else None)]
+        step = max(1, round(frames_per_shard / max(1, self.index_interval)))
+        shards = []
+        if self._runs[0][1][0] > HEADER.size:
+            shards.append((HEADER.size, self._runs[0][1][0], None))
+        shift = None
+        for times, offsets, stop in self._runs:
+            started = self._clock_shift(offsets[0]) # a run without a session frame continues the previous session
+            shift = shift if started is None else started
+            for i in range(0, len(offsets), step):
+                shards.append((offsets[i], offsets[i + step] if i + step < len(offsets) else stop, shift))
+        return shards
+
+    def sessions(self) -> List[Frame]: #session start frames, payload = (time.time(), time.monotonic()) at recorder start
+        return [frame for frame in self.frames(sessions=True) if frame.direction == DIR_SESSION]
+
+    def close(self): #release every memoryview handed out by frames() before closing
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,102 @@
+from FoxPi_read import FoxPiReadDID
+from FoxPi_signals import FoxPiRecord
+
+from typing import Dict, Iterator, NamedTuple, Union
+import math
+import time
+
+
+class Sample(NamedTuple):
+    timestamp: float #time.monotonic() when the response arrived
+    did: int
+    values: Union[Dict[str, Union[int, float, str]], FoxPiRecord, bytes] #decoded signals (a record when the reader has records=True), or the raw byte data when decode=False
+
+
+class DIDStats:
+
+    def __init__(self, did: int, rate: float):
+        self.did = did
+        self.period = 1.0 / rate
+        self.count = 0
+        self.missed = 0 #schedule slots that could not be served before the next one was due
+        self.first = None
+        self.last = None
+        self._mean = 0.0 #running mean / M2 of (interval - period), Welford
+        self._m2 = 0.0
+
+    def add(self, timestamp: float): #account one sample received at timestamp
+        if self.last is not None:
+            error = (timestamp - self.last) - self.period
+            n = self.count #number of intervals including this one
+            delta = error - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (error - self._mean)
+        else:
+            self.first = timestamp
+        self.last = timestamp
+        self.count += 1
+
+    def as_dict(self) -> Dict[str, float]: #achieved rate (Hz), jitter (std dev of the sample interval, s) and missed deadlines
+        span = self.last - self.first if self.count > 1 else 0.0
+        return {
+            "target_rate": 1.0 / self.period,
+            "rate": (self.count - 1) / span if span > 0 else 0.0,
+            "jitter": math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "mean_interval_error": self._mean,
+            "samples": self.count,
+            "missed": self.missed
+        }
+
+
+class FoxPiSampler:
+
+    def __init__(self, reader: FoxPiReadDID, rates: Dict[int, float], decode=True, merge_window=0.005, clock=time.monotonic, sleep=time.sleep): #rates = {did: Hz}
+        self.reader = reader
+        self.rates = dict(rates)
+        self.decode = decode
+        self.merge_window = merge_window #DIDs due within this many seconds are pulled into the same request
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = 0 #0x22 requests put on the wire (sub-batches of read_many included)
+        self.stats = {did: DIDStats(did, rate) for did, rate in self.rates.items()}
+        self._running = False
+
+    def stop(self): #end the samples() generator after the current request
+        self._running = False
+
+    def samples(self, duration: float = None) -> Iterator[Sample]: #poll every DID at its own rate and yield timestamped samples
+        #The generator only sends the next request when the consumer asks for the next sample, so a slow consumer
+        #never builds up a backlog in memory; it shows up as missed deadlines in report() instead.
+        self._running = True
+        start = self.clock()
+        deadline = {did: start for did in self.rates}
+        period = {did: stats.period for did, stats in self.stats.items()}
+        while self._running:
+            now = self.clock()
+            if duration is not None and now - start >= duration:
+                break
+            upcoming = min(deadline.values())
+            if upcoming > now:
+                self.sleep(upcoming - now)
+                now = self.clock()
+            due = [did for did in self.rates if deadline[did] - now <= self.merge_window]
+            self.requests += len(self.reader.batches(due))
+            byte_data = self.reader.read_many(due)
+            timestamp = self.clock()
+            for did in due:
+                slots = deadline[did] + period[did]
+                if slots <= timestamp: #one or more later slots already passed, skip them and stay on the schedule grid
+                    skipped = math.floor((timestamp - slots) / period[did]) + 1
+                    self.stats[did].missed += skipped
+                    slots += skipped * period[did]
+                deadline[did] = slots
+                self.stats[did].add(timestamp)
+            for did in due:
+                data = byte_data[did]
+                yield Sample(timestamp, did, self.reader.decode(did, data) if self.decode else data)
+        self._running = False
+
+    __iter__ = samples
+
+    def report(self) -> Dict[int, Dict[str, float]]: #per DID achieved rate, jitter and missed deadline counters
+        return {did: stats.as_dict() for did, stats in self.stats.items()}
@@ -0,0 +1,147 @@
+from udsoncan.services import ReadDTCInformation
+from client_config import DOIP_SERVER_IP
+from FoxPi_fleet import FleetTarget, FoxPiFleet, FoxPiVehicle
+from FoxPi_log import FOXPI_LOG
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import argparse
+import threading
+import time
+
+
+# Parallel DTC scan over several ECUs. Every ECU gets its own DoIP connection addressed to its logical address (and its own
+# tester address), so no request ever switches the target of a shared client the way FoxPiDTC.Read_DTCs does.
+# Each scan is normalized into DtcRow tuples and diffed against the previous scan:
+#   new      DTC reported now, not in the previous scan
+#   cleared  DTC in the previous scan, not reported now (only for ECUs that answered this scan)
+#   changed  DTC in both scans with a different status byte
+
+STATUS_BITS = ("test_failed", "test_failed_this_operation_cycle", "pending", "confirmed", "test_not_completed_since_last_clear",
+               "test_failed_since_last_clear", "test_not_completed_this_operation_cycle", "warning_indicator_requested") # ISO 14229 DTC status bits 0..7
+
+
+def status_names(status: int) -> List[str]: #names of the bits set in a DTC status byte
+    return [name for bit, name in enumerate(STATUS_BITS) if status >> bit & 1]
+
+
+class DtcRow(NamedTuple):
+    ecu: str #ECU name of the scan target
+    dtc: int #3 byte DTC id
+    status: int #DTC status byte
+
+    def format(self) -> str:
+        return f"{self.ecu:<12} 0x{self.dtc:06X} 0x{self.status:02X} {','.join(status_names(self.status))}"
+
+
+class DtcChange(NamedTuple):
+    ecu: str
+    dtc: int
+    kind: str #"new", "cleared" or "changed"
+    old_status: Optional[int] #None for new DTCs
+    new_status: Optional[int] #None for cleared DTCs
+
+    def format(self) -> str:
+        old = "--" if self.old_status is None else f"0x{self.old_status:02X}"
+        new = "--" if self.new_status is None else f"0x{self.new_status:02X}"
+        return f"{self.kind:<8} {self.ecu:<12} 0x{self.dtc:06X} {old} -> {new}"
+
+
+class DtcScan(NamedTuple):
+    time: float #time.time() when the scan started
+    rows: Tuple[DtcRow, ...] #every DTC reported in this scan, sorted by ECU and DTC
+    errors: Dict[str, BaseException] #ECU name -> error of the ECUs that did not answer
+    changes: List[DtcChange] #difference from the previous scan, empty for the first one
+    elapsed: float #seconds for the whole parallel pass
+
+
+def ecu_targets(addresses: Dict[str, int], ip=DOIP_SERVER_IP, port=13400, client_logical_address=0x0E00) -> List[FleetTarget]:
+    # {ECU name: logical address} behind one DoIP gateway -> one target per ECU with consecutive tester addresses
+    return [FleetTarget(name, ip, address, port, client_logical_address + i) for i, (name, address) in enumerate(addresses.items())]
+
+
+def diff(previous: Iterable[DtcRow], current: Iterable[DtcRow], scanned: Optional[Iterable[str]] = None) -> List[DtcChange]:
+    # scanned: ECU names that answered the current scan; DTCs of the other ECUs are unknown, not cleared (all ECUs when None)
+    old = {(row.ecu, row.dtc): row.status for row in previous}
+    new = {(row.ecu, row.dtc): row.status for row in current}
+    scanned = None if scanned is None else set(scanned)
+    changes = []
+    for key in sorted(old.keys() | new.keys()):
+        ecu, dtc = key
+        if key not in old:
+            changes.append(DtcChange(ecu, dtc, "new", None, new[key]))
+        elif key not in new:
+            if scanned is None or ecu in scanned:
+                changes.append(DtcChange(ecu, dtc, "cleared", old[key], None))
+        elif old[key] != new[key]:
+            changes.append(DtcChange(ecu, dtc, "changed", old[key], new[key]))
+    return changes
+
+
+class FoxPiDTCScanner:
+
+    def __init__(self, targets: Iterable[FleetTarget], status_mask=0x0F, max_workers=8, reconnect_interval=5.0, request_timeout=4, protocol_version=3):
+        # targets: one FleetTarget per ECU (see ecu_targets()); status_mask selects the DTCs reported (0x0F = problem DTCs, like FoxPiDTC)
+        self.status_mask = status_mask
+        self.fleet = FoxPiFleet(targets, max_workers, reconnect_interval, request_timeout, protocol_version)
+        self.previous: Optional[DtcScan] = None
+        self._known: Dict[Tuple[str, int], DtcRow] = {} # last known DTCs per ECU, kept for ECUs that miss a scan
+        self._lock = threading.Lock() # one scan at a time, the diff needs a consistent previous scan
+        self.log = FOXPI_LOG
+
+    def connect(self):
+        return self.fleet.connect()
+
+    def close(self):
+        self.fleet.close()
+
+    def _read(self, vehicle: FoxPiVehicle) -> List[DtcRow]: #0x19 reportDTCByStatusMask on one ECU's own connection
+        response = vehicle.client.read_dtc_information(ReadDTCInformation.Subfunction.reportDTCByStatusMask, status_mask=self.status_mask)
+        return [DtcRow(vehicle.target.name, dtc.id, dtc.status.get_byte_as_int()) for dtc in response.service_data.dtcs or ()]
+
+    def scan(self) -> DtcScan: #read the DTCs of every ECU in parallel and diff them against the previous scan
+        with self._lock:
+            start_time, start = time.time(), time.perf_counter()
+            results = self.fleet.run(self._read)
+            errors = {name: result.error for name, result in results.items() if not result.ok}
+            current = {(row.ecu, row.dtc): row for result in results.values() if result.ok for row in result.value}
+            current.update((key, row) for key, row in self._known.items() if key[0] in errors) # unknown now, not cleared
+            rows = tuple(current[key] for key in sorted(current))
+            changes = diff(self._known.values(), rows, results.keys() - errors.keys()) if self.previous is not None else []
+            self._known = current
+            self.previous = DtcScan(start_time, rows, errors, changes, time.perf_counter() - start)
+        for name, error in errors.items():
+            self.log.error("FoxPiDTCScanner", "%s: %s", name, error)
+        return self.previous
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel DTC scan of several ECUs, printing the full table once and then only the changes")
+    parser.add_argument("ecus", nargs="+", help="NAME=LOGICAL_ADDRESS, e.g. VCU=0x1000")
+    parser.add_argument("--ip", default=DOIP_SERVER_IP)
+    parser.add_argument("--port", type=int, default=13400)
+    parser.add_argument("--client-address", type=lambda value: int(value, 0), default=0x0E00, help="tester address of the first ECU connection")
+    parser.add_argument("--mask", type=lambda value: int(value, 0), default=0x0F, help="DTC status mask")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between scans, 0 = scan once")
+    args = parser.parse_args()
+
+    addresses = {name: int(address, 0) for name, address in (ecu.split("=", 1) for ecu in args.ecus)}
+    with FoxPiDTCScanner(ecu_targets(addresses, args.ip, args.port, args.client_address), args.mask) as scanner:
+        result = scanner.scan()
+        for row in result.rows:
+            print(row.format())
+        for name, error in result.errors.items():
+            print(f"\033[91m{name:<12} {error}\033[0m")
+        print(f"{len(result.rows)} DTCs from {len(addresses) - len(result.errors)}/{len(addresses)} ECUs in {result.elapsed * 1000:.1f} ms")
+        while args.interval > 0:
+            time.sleep(args.interval)
+            result = scanner.scan()
+            for change in result.changes:
+                print(change.format())
+        FOXPI_LOG.flush()
@@ -0,0 +1,329 @@
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import struct
+
+
+# Signal positions use the big-endian (Motorola) convention of the FoxtronPi DIDs:
+# start bit is counted MSB-first over the whole payload, so bit 7 of byte 0 is start 0,
+# bit 0 of byte 0 is start 7, bit 7 of byte 1 is start 8, and so on.
+# physical = raw * factor + offset, the offset may be negative.
+
+class Signal(NamedTuple):
+    name: str
+    start: int #start bit (MSB-first over the payload)
+    length: int #length in bits
+    factor: Union[int, float] = 1
+    offset: Union[int, float] = 0
+    sentinel: Optional[Tuple[int, int]] = None #(start bit, length) of the bits that read all ones when the signal is "FF" (not available)
+    unit: str = ""
+    quantize: Optional[str] = None #decimal places kept (rounded down) for the reported value, e.g. "0.1"
+
+
+class DIDSpec(NamedTuple):
+    name: str #FoxPiReadDID decoder method name
+    length: int #payload length in bytes
+    signals: List[Signal]
+
+
+SIGNAL_TABLE: Dict[int, DIDSpec] = {
+    0x1001: DIDSpec("FoxPi_Driving_Ctrl", 21, [
+        Signal("Acc", 0, 24, 0.05, -15, sentinel=(0, 24), unit="m/s^2"),
+        Signal("Acc_A", 24, 8, sentinel=(24, 8)),
+        Signal("Spd", 32, 24, 0.125, sentinel=(32, 24), unit="km/h"),
+        Signal("Spd_A", 56, 8, sentinel=(56, 8)),
+        Signal("Angle_V", 64, 8, sentinel=(64, 8)),
+        Signal("Angle_Req", 72, 8, sentinel=(72, 8)),
+        Signal("Angle", 80, 32, 0.1, -900, sentinel=(80, 24), unit="deg"),
+        Signal("Torque_V", 112, 8, sentinel=(112, 8)),
+        Signal("Torque_Req", 120, 8, sentinel=(120, 8)),
+        Signal("Torque", 128, 24, 0.01, -10, sentinel=(120, 24), unit="Nm"),
+        Signal("APS_flg", 159, 1, sentinel=(152, 8)),
+        Signal("APS_Sta", 156, 3, sentinel=(152, 8)),
+        Signal("APS_Shift", 152, 4, sentinel=(152, 8)),
+        Signal("APS_Spd", 160, 8, 0.125, sentinel=(160, 8), unit="km/h"),
+    ]),
+    0x1002: DIDSpec("FoxPi_Motion_Status", 13, [
+        Signal("VehicleSpeed", 0, 24, 0.125, unit="km/h"),
+        Signal("LongAcc", 24, 16, 0.01, -1.27, unit="G"),
+        Signal("LongAcc_V", 40, 8),
+        Signal("LatAcc", 48, 16, 0.01, -1.27, unit="G"),
+        Signal("LatAcc_V", 64, 8),
+        Signal("YawRate", 72, 24, 0.1, -100, unit="deg/s"),
+        Signal("YawRate_V", 96, 8),
+    ]),
+    0x1003: DIDSpec("FoxPi_Brake_Status", 13, [
+        Signal("Break_Sw", 0, 8),
+        Signal("Break_Sw_V", 8, 8),
+        Signal("MCPressure", 16, 24, 0.1, -9.7, quantize="0.1"),
+        Signal("MCPressure_V", 40, 8),
+        Signal("PBA_Act", 48, 8),
+        Signal("PBA_Flt", 56, 8),
+        Signal("ABS_Act", 64, 8),
+        Signal("ABS_Flt", 72, 8),
+        Signal("EBD_Act", 80, 8),
+        Signal("EBD_Flt", 88, 8),
+        Signal("ACC_Avail", 96, 8),
+    ]),
+    0x1004: DIDSpec("FoxPi_WheelSpeed", 16, [
+        Signal("RR_WhlSpeed", 0, 24, 0.0625, unit="km/h", quantize="0.0001"),
+        Signal("RR_WhlSpeed_V", 24, 8),
+        Signal("LR_WhlSpeed", 32, 24, 0.0625, unit="km/h", quantize="0.0001"),
+        Signal("LR_WhlSpeed_V", 56, 8),
+        Signal("RF_WhlSpeed", 64, 24, 0.0625, unit="km/h", quantize="0.0001"),
+        Signal("RF_WhlSpeed_V", 88, 8),
+        Signal("LF_WhlSpeed", 96, 24, 0.0625, unit="km/h", quantize="0.0001"),
+        Signal("LF_WhlSpeed_V", 120, 8),
+    ]),
+    0x1005: DIDSpec("FoxPi_EPS_Status", 11, [
+        Signal("SAS_Angle", 0, 32, 0.1, -900, unit="deg", quantize="0.1"),
+        Signal("SAS_V", 32, 8),
+        Signal("SAS_CAL", 40, 8),
+        Signal("EPS_AOI_Ctrl", 48, 8),
+        Signal("EPS_Flt", 56, 8),
+        Signal("EPS_TOI_Act", 64, 8),
+        Signal("EPS_TOI_Avail", 72, 8),
+        Signal("EPS_TOI_Flt", 80, 8),
+    ]),
+    0x1006: DIDSpec("FoxPi_Button_Status", 2, [
+        Signal("SWC_ACC_sta", 7, 1),
+        Signal("SWC_CANCEL_Sta", 6, 1),
+        Signal("SWC_SET_down_Sta", 5, 1),
+        Signal("SWC_RES_up_Sta", 4, 1),
+        Signal("SWC_Distance_Sta", 3, 1),
+        Signal("SWC_mode_Sta", 2, 1),
+        Signal("SWC_Up_Sta", 1, 1),
+        Signal("SWC_Down_Sta", 0, 1),
+        Signal("SWC_Left_Sta", 15, 1),
+        Signal("SWC_Right_Sta", 14, 1),
+        Signal("SWC_RegenDown", 13, 1),
+        Signal("SWC_Undefined_Sta", 12, 1),
+        Signal("SWC_VR_Sta", 11, 1),
+        Signal("SWC_LKA_Sta", 10, 1),
+        Signal("SWC_RegenUp", 9, 1),
+        Signal("SWC_Trip_Sta", 8, 1),
+    ]),
+    0x100A: DIDSpec("FoxPi_Switch_Status", 2, [
+        Signal("Crash_Detect_Status", 7, 1),
+        Signal("Driver_Lock_Status", 6, 1),
+        Signal("All_Door_Switch_Status", 5, 1),
+        Signal("Driver_Door_Switch_Status", 4, 1),
+        Signal("Passenger_Door_Switch_Status", 3, 1),
+        Signal("Rear_Left_Door_Switch_Status", 2, 1),
+        Signal("Rear_Right_Door_Switch_Status", 1, 1),
+        Signal("Tailgate_Switch_Status", 0, 1),
+        Signal("Hood_Switch_Status", 15, 1),
+    ]),
+    0x100B: DIDSpec("FoxPi_Lamp_Status", 2, [
+        Signal("Column_Turn_Lamp_Switch_Status", 6, 2),
+        Signal("Column_Dim_Switch_Status", 5, 1),
+        Signal("Column_Pass_Switch_Status", 4, 1),
+        Signal("Position_Lamp_Status", 3, 1),
+        Signal("Low_Beam_Status", 2, 1),
+        Signal("High_Beam_Status", 1, 1),
+        Signal("Right_Daytime_Running_Light_Status", 0, 1),
+        Signal("Left_Daytime_Running_Light_Status", 15, 1),
+        Signal("Left_Turn_Lamp_Status", 14, 1),
+        Signal("Right_Turn_Lamp_Status", 13, 1),
+        Signal("Brake_Lamp_Status", 12, 1),
+        Signal("Reverse_Lamp_Status", 11, 1),
+        Signal("Rear_Fog_Lamp_Status", 10, 1),
+    ]),
+    0x100C: DIDSpec("FoxPi_Lamp_Ctrl", 6, [
+        Signal("Position_Lamp_Control_Enable", 7, 1),
+        Signal("Position_Lamp", 6, 1),
+        Signal("Low_Beam_Control_Enable", 5, 1),
+        Signal("Low_Beam", 4, 1),
+        Signal("High_Beam_Control_Enable", 3, 1),
+        Signal("High_Beam", 2, 1),
+        Signal("Right_Daytime_Running_Light_Control_Enable", 1, 1),
+        Signal("Right_Daytime_Running_Light", 0, 1),
+        Signal("Left_Daytime_Running_Light_Control_Enable", 15, 1),
+        Signal("Left_Daytime_Running_Light", 14, 1),
+        Signal("Left_TurnLamp_Control_Enable", 13, 1),
+        Signal("Left_TurnLamp", 12, 1),
+        Signal("Right_TurnLamp_Control_Enable", 11, 1),
+        Signal("Right_TurnLamp", 10, 1),
+        Signal("Brake_Lamp_Control_Enable", 9, 1),
+        Signal("Brake_Lamp", 8, 1),
+        Signal("Reverse_Lamp_Control_Enable", 23, 1),
+        Signal("Reverse_Lamp", 22, 1),
+        Signal("Rear_Fog_Lamp_Control_Enable", 21, 1),
+        Signal("Rear_Fog_Lamp", 20, 1),
+        Signal("Amblight_Control_Enable", 19, 1),
+        Signal("Control_Area", 16, 3),
+        Signal("RGB_Color", 24, 8, sentinel=(24, 8)),
+        Signal("Bright", 32, 8, sentinel=(32, 8)),
+        Signal("Mode", 40, 8, sentinel=(40, 8)),
+    ]),
+    0x100D: DIDSpec("FoxPi_Battery_Status", 4, [
+        Signal("LVBatt12V", 0, 8, 0.1, unit="V"),
+        Signal("HVBattSOC", 8, 8, 0.4, unit="%"),
+        Signal("HVBattTemp", 16, 8, 1, -40, unit="°C"),
+        Signal("HVBattContactorSta", 25, 1),
+        Signal("HVBattErr", 24, 1),
+    ]),
+    0x100F: DIDSpec("FoxPi_Pedal_position", 3, [
+        Signal("AccelPedalPos", 0, 8, 0.392, unit="%", quantize="0.001"),
+        Signal("BrakePedalPos", 8, 16, 0.4, unit="%", quantize="0.01"),
+    ]),
+    0x1010: DIDSpec("FoxPi_Motor_Status", 11, [
+        Signal("TqSource", 0, 8),
+        Signal("TMTqReq ", 8, 16, 1, -530, unit="Nm"),
+        Signal("RealTMTq", 24, 16, 1, -1023, unit="Nm"),
+        Signal("MotorAvailTq", 40, 16, 1, -1023, unit="Nm"),
+        Signal("RegenAvailTq", 56, 16, 1, -1023, unit="Nm"),
+        Signal("TMSpd", 72, 16, 1, -32767, unit="rpm"),
+    ]),
+    0x1011: DIDSpec("FoxPi_Shifter_allow", 3, [
+        Signal("ExtTqAllow_flg", 0, 8),
+        Signal("ExtShftAllow_flg", 8, 8),
+        Signal("ExtDoorAllow_flg", 16, 8),
+    ]),
+    0x1012: DIDSpec("FoxPi_Ctrl_Enable_Switch", 1, [
+        Signal("Ctrl_Enable_Switch", 7, 1, sentinel=(0, 8)),
+    ]),
+}
+
+
+_UNPACK = {1: struct.Struct(">B").unpack_from, 2: struct.Struct(">H").unpack_from,
+           4: struct.Struct(">I").unpack_from, 8: struct.Struct(">Q").unpack_from}
+
+
+def extraction(start: int, length: int, payload_length: int) -> Tuple[int, int, int, int]: #compile a bit range into (word width, byte position, right shift, mask) for one struct.unpack_from
+    first = start // 8
+    end = (start + length + 7) // 8 #exclusive end byte
+    width = next(w for w in (1, 2, 4, 8) if w >= end - first)
+    pos = end - width #read the word that ends on the last byte of the signal
+    if pos < 0: #not enough leading bytes, read the word that starts on the first byte instead
+        pos = first
+    if pos + width > payload_length:
+        raise ValueError(f"bits {start}..{start + length - 1} do not fit a {payload_length} byte payload")
+    shift = (pos + width) * 8 - (start + length)
+    return width, pos, shift, (1 << length) - 1
+
+
+class FoxPiRecord:
+    # Base of the per-DID record classes built by DecodePlan: one __slots__ field per signal holding the plain physical value
+    # (raw * factor + offset, no rounding) and `valid`, a bitmask with bit i set when signal i is not "FF".
+    __slots__ = ("valid",)
+    did = None
+    _fields = () #field names in signal table order
+    _signals = () #the Signal of each field
+
+    def is_valid(self, name: str) -> bool:
+        return bool(self.valid >> self._fields.index(name) & 1)
+
+    def values(self) -> Tuple: #plain values in signal table order
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def as_dict(self) -> Dict[str, Union[int, float, str, Decimal]]: #the dict FoxPiReadDID returns by default ("FF" and Decimal rounding applied)
+        values = {}
+        for i, (name, signal) in enumerate(zip(self._fields, self._signals)):
+            value = getattr(self, name)
+            if not self.valid >> i & 1:
+                value = "FF"
+            elif signal.quantize:
+                value = Decimal(str(value)).quantize(Decimal(signal.quantize), rounding=ROUND_DOWN)
+            values[signal.name] = value
+        return values
+
+    def format(self) -> str: #one "name: value unit" line per signal, rounded for display
+        return "\n".join(f"{name}: {value}{' ' + signal.unit if signal.unit and value != 'FF' else ''}"
+                         for (name, value), signal in zip(self.as_dict().items(), self._signals))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self._fields)}, valid={self.valid:#x})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.valid == other.valid and self.values() == other.values()
+
+
+def record_type(did: int, spec: DIDSpec) -> type: #build the FoxPiRecord subclass of a DID, e.g. FoxPi_Motion_Status -> Motion_StatusRecord
+    fields = tuple(signal.name.strip() for signal in spec.signals) #"TMTqReq " -> TMTqReq
+    name = spec.name[len("FoxPi_"):] if spec.name.startswith("FoxPi_") else spec.name
+    return type(f"{name}Record", (FoxPiRecord,), {"__slots__": fields, "did": did, "_fields": fields, "_signals": tuple(spec.signals)})
+
+
+class DecodePlan:
+
+    def __init__(self, did: int, spec: DIDSpec): #compile every signal of the DID into a precomputed extraction step
+        self.did = did
+        self.spec = spec
+        self.steps = []
+        for signal in spec.signals:
+            width, pos, shift, mask = extraction(signal.start, signal.length, spec.length)
+            ff = None
+            if signal.sentinel is not None:
+                ff_width, ff_pos, ff_shift, ff_mask = extraction(*signal.sentinel, spec.length)
+                ff = (_UNPACK[ff_width], ff_pos, ff_shift, ff_mask)
+            quantum = Decimal(signal.quantize) if signal.quantize else None
+            self.steps.append((signal.name, _UNPACK[width], pos, shift, mask, signal.factor, signal.offset, ff, quantum))
+        self.record_type = record_type(did, spec)
+        self.setters = [getattr(self.record_type, name).__set__ for name in self.record_type._fields] #slot descriptors, no attribute lookup per sample
+
+    def decode(self, data, at=0) -> Dict[str, Union[int, float, str, Decimal]]: #decode the DID byte data (starting at byte `at` of data) into a dict of physical values, "FF" marks a not available signal
+        values = {}
+        for name, unpack, pos, shift, mask, factor, offset, ff, quantum in self.steps:
+            if ff is not None and (ff[0](data, at + ff[1])[0] >> ff[2]) & ff[3] == ff[3]:
+                values[name] = "FF"
+                continue
+            value = (unpack(data, at + pos)[0] >> shift) & mask
+            if factor != 1:
+                value = value * factor
+            if offset:
+                value = value + offset
+            if quantum is not None:
+                value = Decimal(str(value)).quantize(quantum, rounding=ROUND_DOWN)
+            values[name] = value
+        return values
+
+
+    def decode_record(self, data, at=0) -> FoxPiRecord: #decode into a new record of plain values and a validity bitmask, no rounding, no "FF" strings
+        record = self.record_type.__new__(self.record_type)
+        self.decode_into(data, record, at)
+        return record
+
+    def decode_into(self, data, target, at=0) -> int:
+        # decode the payload starting at byte `at` of data (bytes, bytearray or a memoryview over the response) straight into
+        # a preallocated target: a record of this DID, or a mutable row (list, array, numpy row) taking the values in signal order.
+        # Returns the validity bitmask (also stored in record.valid). No intermediate bytes objects are created.
+        valid = 0
+        bit = 1
+        record = isinstance(target, self.record_type)
+        for (name, unpack, pos, shift, mask, factor, offset, ff, quantum), store in zip(self.steps, self.setters if record else range(len(self.steps))):
+            value = (unpack(data, at + pos)[0] >> shift) & mask
+            if factor != 1:
+                value = value * factor
+            if offset:
+                value = value + offset
+            if record:
+                store(target, value)
+            else:
+                target[store] = value
+            if ff is None or (ff[0](data, at + ff[1])[0] >> ff[2]) & ff[3] != ff[3]:
+                valid |= bit
+            bit <<= 1
+        if record:
+            target.valid = valid
+        return valid
+
+    def new_record(self) -> FoxPiRecord: #empty record to reuse with decode_into
+        record = self.record_type.__new__(self.record_type)
+        for setter in self.setters:
+            setter(record, 0)
+        record.valid = 0
+        return record
+
+
+DECODE_PLANS: Dict[int, DecodePlan] = {did: DecodePlan(did, spec) for did, spec in SIGNAL_TABLE.items()} #compiled once at import
+
+
+def decode(did: int, data) -> Dict[str, Union[int, float, str, Decimal]]: #decode DID byte data with its compiled plan
+    return DECODE_PLANS[did].decode(data)
+
+
+def decode_record(did: int, data) -> FoxPiRecord: #decode DID byte data into its record class
+    return DECODE_PLANS[did].decode_record(data)
+
+
+RECORD_TYPES: Dict[int, type] = {did: plan.record_type for did, plan in DECODE_PLANS.items()}
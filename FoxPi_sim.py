@@ -0,0 +1,521 @@
+from common import get_uds_client
+from client_config import DoIP_LOGICAL_ADDRESS, DoIP_FUNCTION_ADDRESS
+from FoxPi_signals import SIGNAL_TABLE
+from FoxPi_record import FoxPiRecordReader, DIR_READ
+
+from typing import Callable, Dict, Iterable, List, Optional
+import argparse
+import bisect
+import math
+import os
+import random
+import socket
+import struct
+import threading
+import time
+
+
+# Local stand-in for the FoxtronPi vehicle: a DoIP (ISO 13400) TCP server with routing activation in front of
+# a UDS ECU model serving the 0x1001-0x1012 DIDs. Point a DoIPClient at host/port and use it like the car:
+#   with FoxPiSimulator(port=0) as sim:
+#       doip_client = DoIPClient("127.0.0.1", DoIP_LOGICAL_ADDRESS, tcp_port=sim.port, protocol_version=3)
+
+DOIP_HEADER = struct.Struct("!BBHI") # protocol version, inverse version, payload type, payload length
+ROUTING_ACTIVATION_REQUEST = 0x0005
+ROUTING_ACTIVATION_RESPONSE = 0x0006
+ALIVE_CHECK_RESPONSE = 0x0008
+DIAGNOSTIC_MESSAGE = 0x8001
+DIAGNOSTIC_ACK = 0x8002
+DIAGNOSTIC_NACK = 0x8003
+
+WRITABLE_DIDS = (0x1001, 0x100C, 0x1012) # the DIDs FoxPiWriteDID writes
+DEFAULT_SESSION = 0x01
+EXTENDED_SESSION = 0x03
+
+# UDS negative response codes used by the model
+NRC_SERVICE_NOT_SUPPORTED = 0x11
+NRC_SUBFUNCTION_NOT_SUPPORTED = 0x12
+NRC_INCORRECT_LENGTH = 0x13
+NRC_RESPONSE_TOO_LONG = 0x14
+NRC_SEQUENCE_ERROR = 0x24
+NRC_REQUEST_OUT_OF_RANGE = 0x31
+NRC_SECURITY_ACCESS_DENIED = 0x33
+NRC_INVALID_KEY = 0x35
+NRC_RESPONSE_PENDING = 0x78
+NRC_NOT_SUPPORTED_IN_SESSION = 0x7F
+
+PERIODIC_PERIODS = {0x01: 1.0, 0x02: 0.1, 0x03: 0.02} # 0x2A transmission mode (slow, medium, fast) -> seconds between periodic responses
+PERIODIC_STOP = 0x04
+
+
+def pack_raw(length: int, fields: Iterable, raws: Iterable[int]) -> bytes: #pack raw signal values into a payload, fields = (start, length) in the FoxPi_signals bit convention
+    value = 0
+    total = length * 8
+    for (start, bits), raw in zip(fields, raws):
+        shift = total - (start + bits)
+        value = (value & ~(((1 << bits) - 1) << shift)) | ((raw & ((1 << bits) - 1)) << shift)
+    return value.to_bytes(length, "big")
+
+
+class FoxPiSynthetic:
+
+    def __init__(self, seed=0): #every signal is a slow sine wave of at most 255 raw steps around physical zero, 1 bit flags toggle
+        rng = random.Random(seed)
+        self.waves = {}
+        for did, spec in SIGNAL_TABLE.items():
+            waves = []
+            for signal in spec.signals:
+                top = (1 << signal.length) - 2 # stay below all ones so no signal reads as "FF"
+                zero = min(max(round(-signal.offset / signal.factor), 0), top) # raw value of physical zero
+                amplitude = min(255, zero, top - zero) if zero else min(255, top)
+                waves.append((zero, amplitude, rng.uniform(2.0, 20.0), rng.uniform(0, 2 * math.pi)))
+            self.waves[did] = (spec.length, [(s.start, s.length) for s in spec.signals], waves)
+
+    def __call__(self, did: int, t: float) -> bytes: #payload of the DID t seconds after the simulator started
+        length, fields, waves = self.waves[did]
+        raws = []
+        for (start, bits), (zero, amplitude, period, phase) in zip(fields, waves):
+            if bits == 1:
+                raws.append(int(t / period + phase) & 1)
+                continue
+            wave = math.sin(2 * math.pi * t / period + phase)
+            raws.append(int(zero + amplitude * wave) if zero else int(amplitude * (wave + 1) / 2)) # around zero, or 0..amplitude for unsigned signals
+        return pack_raw(length, fields, raws)
+
+
+class FoxPiReplay:
+
+    def __init__(self, path: str, loop=True, speed=1.0, fallback: Optional[Callable[[int, float], bytes]] = None):
+        # replay the DID reads of a FoxPiRecorder log on its own timeline; DIDs missing from the log come from fallback (FoxPiSynthetic by default)
+        self.loop = loop
+        self.speed = speed
+        self.fallback = fallback or FoxPiSynthetic()
+        self.timeline: Dict[int, tuple] = {} # did -> (seconds from the first frame, payloads)
+        with FoxPiRecordReader(path) as reader:
+            shift = None
+            last = 0.0
+            for frame in reader.frames():
+                if frame.direction != DIR_READ or frame.did not in SIGNAL_TABLE or len(frame.payload) != SIGNAL_TABLE[frame.did].length:
+                    continue
+                if shift is None:
+                    shift = -frame.timestamp
+                elif frame.timestamp + shift < last: # a later recording session on another clock: continue right after the previous one
+                    shift = last - frame.timestamp
+                last = frame.timestamp + shift
+                times, payloads = self.timeline.setdefault(frame.did, ([], []))
+                times.append(last)
+                payloads.append(bytes(frame.payload))
+            frame = None # drop the last memoryview before the map is closed
+        self.duration = max((times[-1] for times, _ in self.timeline.values()), default=0.0)
+
+    def __call__(self, did: int, t: float) -> bytes:
+        if did not in self.timeline:
+            return self.fallback(did, t)
+        times, payloads = self.timeline[did]
+        t *= self.speed
+        if self.loop and self.duration > 0:
+            t %= self.duration
+        return payloads[max(0, bisect.bisect_right(times, t) - 1)]
+
+
+class FoxPiSimECU:
+
+    def __init__(self, source: Optional[Callable[[int, float], bytes]] = None, dtcs: Optional[Dict[int, int]] = None, latency=0.0, jitter=0.0,
+                 s3_timeout=5.0, max_response_length=4095, pending_interval=0.05, seed=None):
+        # source(did, t) -> payload, FoxPiSynthetic() by default; dtcs = {DTC id: status byte}
+        # latency (+ uniform 0..jitter) seconds pass before every response
+        self.source = source or FoxPiSynthetic()
+        self.dtcs = dict(dtcs if dtcs is not None else {0x0A1B2C: 0x09, 0xC12300: 0x08})
+        self.latency = latency
+        self.jitter = jitter
+        self.s3_timeout = s3_timeout
+        self.max_response_length = max_response_length # longer 0x22 responses get NRC 0x14, like the vehicle's buffer limit
+        self.pending_interval = pending_interval # delay after each injected 0x78 response pending
+        self.written: Dict[int, bytes] = {} # DIDs written with 0x2E, served back by 0x22 instead of the source
+        self.session = DEFAULT_SESSION
+        self.security_level = None
+        self.seed = None # (level, seed) of the outstanding requestSeed
+        self.last_activity = time.monotonic()
+        self.start = time.monotonic()
+        self.counters: Dict[int, int] = {} # service id -> requests handled
+        self.dynamic: Dict[int, List[tuple]] = {} # 0x2C defined DID -> [(source DID, 1-based position, size)]
+        self.periodic: Dict[int, float] = {} # 0x2A periodic identifier -> period in seconds, served by the simulator's push thread
+        self.faults = []
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        config = get_uds_client()
+        self._algo = config["security_algo"]
+        self._algo_params = config.get("security_algo_params")
+
+    def inject(self, nrc: int, service: Optional[int] = None, did: Optional[int] = None, rate=1.0, count: Optional[int] = None):
+        # answer matching requests (any service / any DID when None) with NRC nrc at the given rate, at most count times
+        # nrc 0x78 sends a response pending first and then the real response
+        self.faults.append([nrc, service, did, rate, count])
+        return self
+
+    def clear_faults(self):
+        self.faults = []
+
+    def delay(self) -> float: #seconds to wait before the next response
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def _fault(self, request: bytes) -> Optional[int]:
+        service = request[0]
+        did = struct.unpack_from(">H", request, 1)[0] if service in (0x22, 0x2E) and len(request) >= 3 else None
+        for fault in self.faults:
+            nrc, fault_service, fault_did, rate, count = fault
+            if (fault_service is not None and fault_service != service) or (fault_did is not None and fault_did != did):
+                continue
+            if count is not None and count <= 0:
+                continue
+            if rate < 1.0 and self._random.random() >= rate:
+                continue
+            if count is not None:
+                fault[4] -= 1
+            return nrc
+        return None
+
+    def _key(self, level: int, seed: bytes) -> bytes: #expected key, computed with the security algorithm of the client configuration the same way udsoncan calls it
+        try:
+            names = self._algo.__code__.co_varnames[:self._algo.__code__.co_argcount]
+            params = {name: value for name, value in (("seed", seed), ("level", level), ("params", self._algo_params)) if name in names}
+        except AttributeError:
+            params = {"seed": seed, "params": self._algo_params, "level": level}
+        return bytes(self._algo(**params))
+
+    def handle(self, request: bytes) -> List[bytes]: #UDS request -> responses to send in order, [] when the positive response is suppressed
+        with self.lock:
+            now = time.monotonic()
+            if self.session != DEFAULT_SESSION and now - self.last_activity > self.s3_timeout:
+                self.session = DEFAULT_SESSION # S3 expired
+                self.security_level = None
+            self.last_activity = now
+            if not request:
+                return []
+            service = request[0]
+            self.counters[service] = self.counters.get(service, 0) + 1
+            responses = []
+            nrc = self._fault(request)
+            if nrc == NRC_RESPONSE_PENDING:
+                responses.append(bytes((0x7F, service, NRC_RESPONSE_PENDING)))
+            elif nrc is not None:
+                return [bytes((0x7F, service, nrc))]
+            handler = self.services.get(service)
+            try:
+                response = handler(self, request) if handler else bytes((0x7F, service, NRC_SERVICE_NOT_SUPPORTED))
+            except (IndexError, struct.error): # request shorter than its service needs
+                response = bytes((0x7F, service, NRC_INCORRECT_LENGTH))
+            if response is not None:
+                responses.append(response)
+            return responses
+
+    def _session_control(self, request):
+        if len(request) != 2:
+            return bytes((0x7F, 0x10, NRC_INCORRECT_LENGTH))
+        session = request[1] & 0x7F
+        if session not in (0x01, 0x02, 0x03):
+            return bytes((0x7F, 0x10, NRC_SUBFUNCTION_NOT_SUPPORTED))
+        self.session = session
+        self.security_level = None # every session change relocks security access
+        self.periodic.clear() # and stops periodic transmission
+        self.seed = None
+        if request[1] & 0x80:
+            return None
+        return bytes((0x50, session)) + struct.pack(">HH", 50, 500) # P2 50 ms, P2* 5000 ms (10 ms units)
+
+    def _security_access(self, request):
+        subfunction = request[1] & 0x7F
+        if self.session == DEFAULT_SESSION:
+            return bytes((0x7F, 0x27, NRC_NOT_SUPPORTED_IN_SESSION))
+        level = (subfunction + 1) // 2
+        if subfunction % 2: # requestSeed
+            if self.security_level == level:
+                seed = bytes(4) # already unlocked
+            else:
+                seed = bytes(self._random.getrandbits(8) for _ in range(4))
+                self.seed = (level, seed)
+            return bytes((0x67, subfunction)) + seed
+        if self.seed is None or self.seed[0] != level: # sendKey without requestSeed
+            return bytes((0x7F, 0x27, NRC_SEQUENCE_ERROR))
+        _, seed = self.seed
+        self.seed = None
+        if bytes(request[2:]) != self._key(level, seed):
+            return bytes((0x7F, 0x27, NRC_INVALID_KEY))
+        self.security_level = level
+        return bytes((0x67, subfunction))
+
+    def _read(self, request):
+        if len(request) < 3 or len(request) % 2 == 0:
+            return bytes((0x7F, 0x22, NRC_INCORRECT_LENGTH))
+        dids = struct.unpack_from(f">{(len(request) - 1) // 2}H", request, 1)
+        if any(self.length(did) is None for did in dids):
+            return bytes((0x7F, 0x22, NRC_REQUEST_OUT_OF_RANGE))
+        if 1 + sum(2 + self.length(did) for did in dids) > self.max_response_length:
+            return bytes((0x7F, 0x22, NRC_RESPONSE_TOO_LONG))
+        t = time.monotonic() - self.start
+        response = bytearray(b"\x62")
+        for did in dids:
+            response += struct.pack(">H", did)
+            response += self.payload(did, t)
+        return bytes(response)
+
+    def length(self, did: int) -> Optional[int]: #payload length of a status or dynamically defined DID, None when unknown
+        if did in self.dynamic:
+            return sum(size for _, _, size in self.dynamic[did])
+        return SIGNAL_TABLE[did].length if did in SIGNAL_TABLE else None
+
+    def payload(self, did: int, t: float) -> bytes: #current byte data of a status or dynamically defined DID
+        if did in self.dynamic:
+            return b"".join(self.payload(source, t)[position - 1:position - 1 + size] for source, position, size in self.dynamic[did])
+        return self.written[did] if did in self.written else self.source(did, t)
+
+    def periodic_did(self, periodic_id: int) -> Optional[int]: #0xF2xx DID of a periodic identifier; the status DIDs answer to their low byte as well
+        if self.length(0xF200 | periodic_id) is not None:
+            return 0xF200 | periodic_id
+        return next((did for did in SIGNAL_TABLE if did & 0xFF == periodic_id), None)
+
+    def periodic_response(self, periodic_id: int) -> Optional[bytes]: #one periodic message: 0x6A, periodic identifier, DID data
+        with self.lock:
+            did = self.periodic_did(periodic_id)
+            if did is None:
+                return None
+            return bytes((0x6A, periodic_id)) + self.payload(did, time.monotonic() - self.start)
+
+    def _read_periodic(self, request):
+        mode = request[1]
+        periodic_ids = request[2:]
+        if mode == PERIODIC_STOP:
+            for periodic_id in periodic_ids or list(self.periodic):
+                self.periodic.pop(periodic_id, None)
+            return b"\x6A"
+        if mode not in PERIODIC_PERIODS or not periodic_ids:
+            return bytes((0x7F, 0x2A, NRC_REQUEST_OUT_OF_RANGE if periodic_ids else NRC_INCORRECT_LENGTH))
+        if any(self.periodic_did(periodic_id) is None for periodic_id in periodic_ids):
+            return bytes((0x7F, 0x2A, NRC_REQUEST_OUT_OF_RANGE))
+        for periodic_id in periodic_ids:
+            self.periodic[periodic_id] = PERIODIC_PERIODS[mode]
+        return b"\x6A"
+
+    def _dynamic_define(self, request):
+        subfunction = request[1] & 0x7F
+        if subfunction == 0x03: # clearDynamicallyDefinedDataIdentifier, all of them without a DID
+            for did in (struct.unpack_from(">H", request, 2) if len(request) >= 4 else list(self.dynamic)):
+                self.dynamic.pop(did, None)
+            return None if request[1] & 0x80 else bytes((0x6C, 0x03)) + bytes(request[2:4])
+        if subfunction != 0x01: # only defineByIdentifier
+            return bytes((0x7F, 0x2C, NRC_SUBFUNCTION_NOT_SUPPORTED))
+        did = struct.unpack_from(">H", request, 2)[0]
+        entries = [struct.unpack_from(">HBB", request, at) for at in range(4, len(request), 4)]
+        if not 0xF200 <= did <= 0xF3FF or not entries or (len(request) - 4) % 4:
+            return bytes((0x7F, 0x2C, NRC_REQUEST_OUT_OF_RANGE if entries else NRC_INCORRECT_LENGTH))
+        if any(source not in SIGNAL_TABLE or position < 1 or position - 1 + size > SIGNAL_TABLE[source].length for source, position, size in entries):
+            return bytes((0x7F, 0x2C, NRC_REQUEST_OUT_OF_RANGE))
+        self.dynamic[did] = self.dynamic.get(did, []) + entries # a second define appends to the DID
+        return None if request[1] & 0x80 else bytes((0x6C, 0x01)) + bytes(request[2:4])
+
+    def _write(self, request):
+        did = struct.unpack_from(">H", request, 1)[0]
+        if did not in WRITABLE_DIDS:
+            return bytes((0x7F, 0x2E, NRC_REQUEST_OUT_OF_RANGE))
+        if self.session == DEFAULT_SESSION:
+            return bytes((0x7F, 0x2E, NRC_NOT_SUPPORTED_IN_SESSION))
+        if self.security_level is None:
+            return bytes((0x7F, 0x2E, NRC_SECURITY_ACCESS_DENIED))
+        if len(request) != 3 + SIGNAL_TABLE[did].length:
+            return bytes((0x7F, 0x2E, NRC_INCORRECT_LENGTH))
+        self.written[did] = bytes(request[3:])
+        return b"\x6E" + bytes(request[1:3])
+
+    def _read_dtc(self, request):
+        if request[1] & 0x7F != 0x02: # only reportDTCByStatusMask
+            return bytes((0x7F, 0x19, NRC_SUBFUNCTION_NOT_SUPPORTED))
+        mask = request[2]
+        response = bytearray((0x59, 0x02, 0xFF))
+        for dtc, status in self.dtcs.items():
+            if status & mask:
+                response += dtc.to_bytes(3, "big") + bytes((status,))
+        return bytes(response)
+
+    def _clear_dtc(self, request):
+        if len(request) != 4:
+            return bytes((0x7F, 0x14, NRC_INCORRECT_LENGTH))
+        group = int.from_bytes(request[1:4], "big")
+        if group == 0xFFFFFF:
+            self.dtcs.clear()
+        elif group in self.dtcs:
+            del self.dtcs[group]
+        else:
+            return bytes((0x7F, 0x14, NRC_REQUEST_OUT_OF_RANGE))
+        return b"\x54"
+
+    def _tester_present(self, request):
+        if len(request) != 2 or request[1] & 0x7F != 0x00:
+            return bytes((0x7F, 0x3E, NRC_SUBFUNCTION_NOT_SUPPORTED))
+        return None if request[1] & 0x80 else b"\x7E\x00"
+
+    services = {0x10: _session_control, 0x27: _security_access, 0x22: _read, 0x2E: _write,
+                0x19: _read_dtc, 0x14: _clear_dtc, 0x3E: _tester_present, 0x2A: _read_periodic,
+                0x2C: _dynamic_define}
+
+
+class FoxPiSimulator:
+
+    def __init__(self, ecu: Optional[FoxPiSimECU] = None, host="127.0.0.1", port=13400, logical_address=DoIP_LOGICAL_ADDRESS,
+                 function_address=DoIP_FUNCTION_ADDRESS): #port=0 picks a free port, read it back from .port after start()
+        self.ecu = ecu or FoxPiSimECU()
+        self.host = host
+        self.port = port
+        self.logical_address = logical_address
+        self.function_address = function_address # functional requests (e.g. FoxPiDTC) are answered by the same ECU
+        self.connections = 0 # TCP connections accepted
+        self._server = None
+        self._thread = None
+        self._clients = set()
+        self._send_locks = {} # socket -> lock serializing its writes
+        self._send_lock = threading.Lock() # for sockets without an entry (already closed)
+        self._stop = threading.Event()
+
+    def start(self): #listen and serve every tester connection in its own thread
+        if self._server is None:
+            self._server = socket.create_server((self.host, self.port))
+            self._server.settimeout(0.2)
+            self.port = self._server.getsockname()[1]
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._accept, name="FoxPi-sim", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for sock in list(self._clients):
+            try:
+                sock.close()
+            except OSError:
+                pass
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                sock, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+            self.connections += 1
+            self._clients.add(sock)
+            threading.Thread(target=self._serve, args=(sock,), name="FoxPi-sim-client", daemon=True).start()
+
+    def _recv(self, sock, size) -> Optional[bytes]:
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return bytes(data)
+
+    def _send(self, sock, version, payload_type, payload):
+        with self._send_locks.get(sock, self._send_lock):
+            sock.sendall(DOIP_HEADER.pack(version, version ^ 0xFF, payload_type, len(payload)) + payload)
+
+    def _push(self, sock, version, tester): #send the periodic responses of the scheduled 0x2A identifiers until the connection closes
+        due = {}
+        try:
+            while not self._stop.is_set() and sock in self._clients:
+                now = time.monotonic()
+                schedule = dict(self.ecu.periodic)
+                for periodic_id in list(due):
+                    if periodic_id not in schedule:
+                        del due[periodic_id]
+                for periodic_id, period in schedule.items():
+                    if due.setdefault(periodic_id, now) <= now:
+                        response = self.ecu.periodic_response(periodic_id)
+                        if response is not None:
+                            self._send(sock, version, DIAGNOSTIC_MESSAGE, struct.pack("!HH", self.logical_address, tester) + response)
+                        due[periodic_id] = max(due[periodic_id] + period, now)
+                time.sleep(max(0.0, min(due.values(), default=now + 0.01) - time.monotonic()) if due else 0.01)
+        except OSError:
+            pass
+
+    def _serve(self, sock):
+        tester = None # source address of the activated tester
+        pusher = None
+        self._send_locks[sock] = threading.Lock() # the push thread and the request handling share the socket
+        try:
+            while not self._stop.is_set():
+                header = self._recv(sock, DOIP_HEADER.size)
+                if header is None:
+                    break
+                version, inverse, payload_type, length = DOIP_HEADER.unpack(header)
+                payload = self._recv(sock, length) if length else b""
+                if payload is None or inverse != version ^ 0xFF:
+                    break
+                if payload_type == ROUTING_ACTIVATION_REQUEST:
+                    tester = struct.unpack_from("!H", payload)[0]
+                    self._send(sock, version, ROUTING_ACTIVATION_RESPONSE, struct.pack("!HHBL", tester, self.logical_address, 0x10, 0))
+                elif payload_type == DIAGNOSTIC_MESSAGE:
+                    source, target = struct.unpack_from("!HH", payload)
+                    if tester is None or source != tester:
+                        self._send(sock, version, DIAGNOSTIC_NACK, struct.pack("!HHB", target, source, 0x02)) # invalid source address
+                        continue
+                    if target not in (self.logical_address, self.function_address):
+                        self._send(sock, version, DIAGNOSTIC_NACK, struct.pack("!HHB", target, source, 0x03)) # unknown target address
+                        continue
+                    self._send(sock, version, DIAGNOSTIC_ACK, struct.pack("!HHB", target, source, 0x00))
+                    responses = self.ecu.handle(payload[4:])
+                    if pusher is None and payload[4:5] == b"\x2A":
+                        pusher = threading.Thread(target=self._push, args=(sock, version, source), name="FoxPi-sim-periodic", daemon=True)
+                        pusher.start()
+                    for i, response in enumerate(responses):
+                        wait = 0.0 if i < len(responses) - 1 else self.ecu.delay() + (self.ecu.pending_interval if i else 0.0) # response pending goes out at once
+                        if wait > 0:
+                            time.sleep(wait)
+                        self._send(sock, version, DIAGNOSTIC_MESSAGE, struct.pack("!HH", self.logical_address, source) + response)
+                elif payload_type == ALIVE_CHECK_RESPONSE:
+                    continue
+        except OSError:
+            pass
+        finally:
+            self._clients.discard(sock)
+            self._send_locks.pop(sock, None)
+            sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local DoIP/UDS stand-in for the FoxtronPi vehicle")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=13400)
+    parser.add_argument("--replay", help="FoxPiRecorder log to serve the DIDs from (synthetic signals when omitted)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform 0..jitter seconds before every response")
+    parser.add_argument("--nrc", action="append", default=[], metavar="NRC[:SERVICE[:RATE]]",
+                        help="inject a negative response, e.g. 0x78:0x22:0.1 (repeatable)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for seeds, jitter and NRC injection")
+    args = parser.parse_args()
+    source = FoxPiReplay(args.replay, speed=args.speed) if args.replay else FoxPiSynthetic()
+    ecu = FoxPiSimECU(source, latency=args.latency, jitter=args.jitter, seed=args.seed)
+    for spec in args.nrc:
+        fields = spec.split(":")
+        ecu.inject(int(fields[0], 0), int(fields[1], 0) if len(fields) > 1 and fields[1] else None, rate=float(fields[2]) if len(fields) > 2 else 1.0)
+    with FoxPiSimulator(ecu, args.host, args.port) as sim:
+        print(f"FoxPi simulator listening on {sim.host}:{sim.port}, logical address 0x{sim.logical_address:04X}"
+              + (f", replaying {os.path.basename(args.replay)}" if args.replay else ", synthetic signals"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,100 @@
+from FoxPi_write import FoxPiWriteDID, DrivingCtrlEncoder, DRIVING_CTRL_SIGNALS, DRIVING_CTRL_LENGTH, DRIVING_CTRL_FF
+from FoxPi_control import LoopStats
+from FoxPi_log import FOXPI_LOG
+
+from typing import Dict, List, Optional, Sequence
+import csv
+import time
+
+
+SIGNAL_NAMES = [name for name, low, high in DRIVING_CTRL_SIGNALS]
+
+
+class FoxPiTrajectory:
+
+    def __init__(self, points: Sequence[Sequence[float]], period=0.02, times: Optional[Sequence[float]] = None):
+        # points: one row of the 14 Driving_Ctrl setpoints per step (write.py order)
+        # times: seconds from the start for each step, default every `period` seconds
+        self.times = [i * period for i in range(len(points))] if times is None else [float(t) for t in times]
+        if len(self.times) != len(points):
+            raise ValueError(f"{len(points)} points but {len(self.times)} times")
+        if any(b < a for a, b in zip(self.times, self.times[1:])):
+            raise ValueError("trajectory times must not go backwards")
+        encoder = DrivingCtrlEncoder()
+        errors = []
+        for i, point in enumerate(points): # validate every point before anything is encoded or sent
+            try:
+                encoder.validate(point)
+            except ValueError as e:
+                errors.append(f"point {i}: {e}")
+        if errors:
+            raise ValueError(f"{len(errors)} invalid trajectory points: " + "; ".join(errors[:10]))
+        self.buffer = bytearray(DRIVING_CTRL_LENGTH * len(points)) # every frame back to back
+        for i, point in enumerate(points):
+            encoder.encode_into(point, self.buffer, i * DRIVING_CTRL_LENGTH, validate=False)
+        self.stats = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def frame(self, i: int) -> memoryview: # zero-copy view of the i-th 21 byte frame
+        return memoryview(self.buffer)[i * DRIVING_CTRL_LENGTH:(i + 1) * DRIVING_CTRL_LENGTH]
+
+    @classmethod
+    def from_arrays(cls, columns: Dict[str, Sequence[float]], period=0.02, times: Optional[Sequence[float]] = None) -> "FoxPiTrajectory":
+        # columns: {signal name: values}, every name of DRIVING_CTRL_SIGNALS is required
+        missing = [name for name in SIGNAL_NAMES if name not in columns]
+        if missing:
+            raise ValueError(f"missing trajectory columns: {missing}")
+        return cls(list(zip(*(columns[name] for name in SIGNAL_NAMES))), period, times)
+
+    @classmethod
+    def from_csv(cls, path: str, period=0.02) -> "FoxPiTrajectory":
+        # CSV with a header row of the signal names, plus an optional "time" column (seconds from the start)
+        columns: Dict[str, List[float]] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                for name, value in row.items():
+                    value = float(value)
+                    columns.setdefault(name.strip(), []).append(int(value) if value.is_integer() else value)
+        times = columns.pop("time", None)
+        return cls.from_arrays(columns, period, times)
+
+    def play(self, writer: FoxPiWriteDID, spin=0.001, safe_on_stop=True) -> LoopStats: # send every frame at its time, returns the timing statistics
+        frames = [bytes(self.frame(i)) for i in range(len(self))] # sliced before the maneuver starts
+        self.stats = stats = LoopStats(self.times[1] - self.times[0] if len(self) > 1 else 0.0)
+        writer.ensure_unlocked() # session entry and seed/key happen once, before the first frame
+        start = time.perf_counter()
+        error = None
+        try:
+            for i, frame in enumerate(frames):
+                deadline = start + self.times[i]
+                wait = deadline - time.perf_counter() - spin
+                if wait > 0:
+                    time.sleep(wait)
+                while time.perf_counter() < deadline:
+                    pass
+                now = time.perf_counter()
+                stats.start_error.append(now - deadline)
+                writer.write(0x1001, frame)
+                finished = time.perf_counter()
+                stats.latency.append(finished - now)
+                stats.cycles += 1
+                if i + 1 < len(frames) and finished > start + self.times[i + 1]:
+                    stats.missed += 1 # frame i+1 will go out late
+        except BaseException as e:
+            if isinstance(e, Exception): # a KeyboardInterrupt is an abort, not a write error
+                stats.errors += 1
+            error = e
+            raise
+        finally:
+            if safe_on_stop: # the maneuver ends (or aborts) in the Driving_Ctrl_toFF safe state
+                stats.safe += 1
+                try:
+                    writer.write(0x1001, DRIVING_CTRL_FF)
+                except Exception as e: # never hide the error that aborted the maneuver
+                    stats.errors += 1
+                    if error is None:
+                        raise
+                    FOXPI_LOG.error("FoxPiTrajectory", "safe state write failed while aborting on %r: %s", error, e)
+        return stats
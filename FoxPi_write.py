@@ -4,18 +4,266 @@ from common import get_uds_client
 from client_config import DOIP_SERVER_IP, DoIP_LOGICAL_ADDRESS
 from udsoncan.client import Client
 from udsoncan.services import *
-import datetime
+from udsoncan.exceptions import NegativeResponseException
+from udsoncan import Response
+from FoxPi_TP import FoxPiTP
+from FoxPi_log import FOXPI_LOG, Hex
+from typing import List, NamedTuple, Optional
 import os
 import math
+import struct
+import time
+
+
+# Driving_Ctrl (DID 0x1001) setpoints in user_input order with their physical range (min, max)
+DRIVING_CTRL_SIGNALS = [
+    ("AccReq", -15, 15),
+    ("AccReq_A", 0, 1),
+    ("TargetSpd", 0, 255.875),
+    ("TargetSpd_A", 0, 1),
+    ("Angle_V", 0, 1),
+    ("Angle_Req", 0, 1),
+    ("Angle", -900, 900),
+    ("Torque_V", 0, 1),
+    ("Torque_Req", 0, 1),
+    ("Torque", -10, 10),
+    ("APSVMCReqA_flg", 0, 1),
+    ("APSStaSystem", 0, 7),
+    ("APSShiftPosnReq", 0, 15),
+    ("APSSpeedCMD", 0, 31.75)
+]
+DRIVING_CTRL_LENGTH = 21
+DRIVING_CTRL_FF = bytes([0xff]*DRIVING_CTRL_LENGTH) # safe state: every Driving_Ctrl signal not requested
+
+
+class DrivingCtrlEncoder:
+
+    # ACCReq(3) ACCReq_A TargetSpdReq(3) TargetSpdReq_A Angle_V Angle_Req Angle(4) Torque_V Torque_Req Torque(3) APS APSSpeedCMD, 3 byte fields packed as B+H
+    frame = struct.Struct(">BHBBHBBBIBBBHBB")
+
+    def __init__(self): # the encoder owns one preallocated 21 byte frame that encode() fills in place
+        self.buffer = bytearray(DRIVING_CTRL_LENGTH)
+
+    def validate(self, user_input): # raise ValueError unless there are 14 setpoints inside their DRIVING_CTRL_SIGNALS range (bit fields must be integers)
+        if len(user_input) != len(DRIVING_CTRL_SIGNALS):
+            raise ValueError(f"Driving_Ctrl needs exactly {len(DRIVING_CTRL_SIGNALS)} values but {len(user_input)} were provided")
+        for i, ((name, low, high), value) in enumerate(zip(DRIVING_CTRL_SIGNALS, user_input)):
+            if not low <= value <= high:
+                raise ValueError(f"Driving_Ctrl {name}={value} is outside [{low}, {high}]")
+            if 10 <= i <= 12 and not float(value).is_integer(): # APS bit fields
+                raise ValueError(f"Driving_Ctrl {name}={value} must be an integer")
+
+    def encode_into(self, user_input, buffer, offset=0, validate=True): # pack the 14 setpoints into buffer[offset:offset+21] without allocating
+        if validate:
+            self.validate(user_input)
+        #to convert all elements to int, if they are float and integer, otherwise keep as is
+        v = [int(x) if isinstance(x, float) and x.is_integer() else x for x in user_input]
+        acc = math.floor((v[0]-(-15))/0.05) #math.floor rounds down to the nearest integer(3.7->3,-3.7->-4,5.0->5)
+        spd = math.floor(v[2]/0.125)
+        torque = math.floor((v[9]-(-10))/0.01)
+        self.frame.pack_into(buffer, offset,
+            acc >> 16, acc & 0xFFFF, math.floor(v[1]), #ACCReq = 3byte, ACCReq_A = 1byte
+            spd >> 16, spd & 0xFFFF, math.floor(v[3]), #TargetSpdReq = 3byte, TargetSpdReq_A = 1byte
+            math.floor(v[4]), math.floor(v[5]), #Angle_Target_Valid, Angle_Target_Req = 1byte
+            math.floor((v[6]-(-900))/0.1), #Angle_Target = 4byte
+            math.floor(v[7]), math.floor(v[8]), #Torque_Target_Valid, Torque_Target_Req = 1byte
+            torque >> 16, torque & 0xFFFF, #Torque_Target = 3byte
+            (v[12] << 4) | (v[11] << 1) | v[10], #APS = 1byte: APSShiftPosnReq bit7-4, APSStaSystem bit3-1, APSVMCReqA_flg bit0
+            math.floor(v[13]/0.125)) #VINP_APSSpeedCMD_kph = 1byte
+        return buffer
+
+    def encode(self, user_input, validate=True) -> bytearray: # pack the setpoints into the encoder's own buffer and return it
+        return self.encode_into(user_input, self.buffer, 0, validate)
+
+
+LAMP_CTRL_LENGTH = 6
+LAMP_CTRL_LIMITS = [1] * 21 + [7, 255, 255, 255] # largest value of each FoxPi_Lamp_Ctrl input: 21 bits, control area (3 bits), RGB, brightness, mode
+WRITE_LENGTHS = {0x1001: DRIVING_CTRL_LENGTH, 0x100C: LAMP_CTRL_LENGTH, 0x1012: 1} # writable DIDs and their payload length
+
+
+def encode_lamp_ctrl(user_input, validate=True) -> bytes: # pack the 25 FoxPi_Lamp_Ctrl inputs into the 6 byte 0x100C frame
+    if validate:
+        if len(user_input) != len(LAMP_CTRL_LIMITS):
+            raise ValueError(f"Lamp_Ctrl needs exactly {len(LAMP_CTRL_LIMITS)} values but {len(user_input)} were provided")
+        for i, (high, value) in enumerate(zip(LAMP_CTRL_LIMITS, user_input)):
+            if not float(value).is_integer() or not 0 <= value <= high:
+                raise ValueError(f"Lamp_Ctrl input {i}={value} must be an integer in [0, {high}]")
+    v = [int(x) for x in user_input]
+    bit1 = ((v[7] << 7) | #Right_Daytime_Running_Light
+            (v[6] << 6) | #Right_Daytime_Running_Light_Control_Enable
+            (v[5] << 5) | #High_Beam
+            (v[4] << 4) | #High_Beam_Control_Enable
+            (v[3] << 3) | #Low_Beam
+            (v[2] << 2) | #Low_Beam_Control_Enable
+            (v[1] << 1) | #Position_Lamp
+            (v[0] << 0) ) #Position_Lamp_Control_Enable
+    bit2 = ((v[15] << 7) | #Brake_Lamp
+            (v[14] << 6) | #Brake_Lamp_Control_Enable
+            (v[13] << 5) | #Right_TurnLamp
+            (v[12] << 4) | #Right_TurnLamp_Control_Enable
+            (v[11] << 3) | #Left_TurnLamp
+            (v[10] << 2) | #Left_TurnLamp_Control_Enable
+            (v[9] << 1) | #Left_Daytime_Running_Light
+            (v[8] << 0) ) #Left_Daytime_Running_Light_Control_Enable
+    bit3 = ((v[21] << 5) | #Control area
+            (v[20] << 4) | #Amblight_Control_Enable
+            (v[19] << 3) | #Rear_Fog_Lamp
+            (v[18] << 2) | #Rear_Fog_Lamp_Control_Enable
+            (v[17] << 1) | #Reverse_Lamp
+            (v[16] << 0) ) #Reverse_Lamp_Control_Enable
+    return bytes((bit1, bit2, bit3, v[22], v[23], v[24])) #RGB 64 Color, Bright adjustment, Breathing and Alert Mode = 1 byte each
+
+
+class WriteResult(NamedTuple):
+    did: int
+    data: bytes
+    ok: bool
+    error: Optional[BaseException] #negative response or transport error, None when ok or skipped
+    elapsed: float #seconds spent on the write, 0.0 when skipped after an earlier failure
+    skipped: bool = False #not sent because an earlier write of the transaction failed
+
+
+class FoxPiWriteTransaction:
+
+    def __init__(self, writer: "FoxPiWriteDID", rollback=True, stop_on_error=True):
+        # rollback: write DRIVING_CTRL_FF to 0x1001 when any write fails; stop_on_error: skip the writes after the first failure
+        self.writer = writer
+        self.rollback = rollback
+        self.stop_on_error = stop_on_error
+        self.writes = [] # (did, data) in send order, every payload already validated and encoded
+        self.results: List[WriteResult] = []
+        self.rollback_result: Optional[WriteResult] = None
+        self.spread = 0.0 # seconds from the start of the first write to the end of the last one
+        self._encoder = DrivingCtrlEncoder()
+
+    def add(self, did, data): # queue a raw payload for a writable DID
+        if did not in WRITE_LENGTHS:
+            raise ValueError(f"0x{did:04X} is not a writable DID")
+        if len(data) != WRITE_LENGTHS[did]:
+            raise ValueError(f"0x{did:04X} needs {WRITE_LENGTHS[did]} bytes but {len(data)} were provided")
+        self.writes.append((did, bytes(data)))
+        return self
+
+    def driving_ctrl(self, user_input): # the 14 FoxPi_Driving_Ctrl setpoints
+        return self.add(0x1001, self._encoder.encode(user_input))
+
+    def driving_ctrl_to_ff(self): # Driving_Ctrl safe state, every signal not requested
+        return self.add(0x1001, DRIVING_CTRL_FF)
+
+    def lamp_ctrl(self, user_input): # the 25 FoxPi_Lamp_Ctrl inputs
+        return self.add(0x100C, encode_lamp_ctrl(user_input))
+
+    def ctrl_enable(self, value): # FoxPi_Ctrl_Enable_Switch value 0..255
+        if not float(value).is_integer() or not 0 <= value <= 0xFF:
+            raise ValueError(f"Ctrl_Enable_Switch={value} must be an integer in [0, 255]")
+        return self.add(0x1012, bytes((int(value),)))
+
+    def _write(self, did, data) -> WriteResult:
+        start = time.perf_counter()
+        try:
+            self.writer.write(did, data)
+        except Exception as e:
+            self.writer.log.error("FoxPiWriteDID", "transaction write 0x%x failed: %s", did, e)
+            return WriteResult(did, data, False, e, time.perf_counter() - start)
+        return WriteResult(did, data, True, None, time.perf_counter() - start)
+
+    def commit(self) -> List[WriteResult]: # unlock once, send every queued write back to back, roll back on failure
+        self.results = []
+        self.rollback_result = None
+        if not self.writes:
+            return self.results
+        try:
+            self.writer.ensure_unlocked()
+        except Exception as e: # nothing was written, nothing to roll back
+            self.writer.log.error("FoxPiWriteDID", "transaction unlock failed: %s", e)
+            self.results = [WriteResult(did, data, False, e, 0.0, True) for did, data in self.writes]
+            return self.results
+        start = time.perf_counter()
+        failed = False
+        for did, data in self.writes:
+            if failed and self.stop_on_error:
+                self.results.append(WriteResult(did, data, False, None, 0.0, True))
+                continue
+            result = self._write(did, data)
+            failed = failed or not result.ok
+            self.results.append(result)
+        self.spread = time.perf_counter() - start
+        if failed and self.rollback:
+            self.rollback_result = self._write(0x1001, DRIVING_CTRL_FF)
+        self.writes = []
+        return self.results
+
+    @property
+    def ok(self) -> bool: # every write of the last commit succeeded
+        return bool(self.results) and all(result.ok for result in self.results)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb): # commit when the with block finished without an exception, drop the writes otherwise
+        if exc_type is None:
+            self.commit()
+        else:
+            self.writes = []
 
 
 class FoxPiWriteDID:
 
-    def __init__(self, client): # Initialization function; pass in the client parameter, which is the UDS communication object.
+    def __init__(self, client, s3_timeout=5.0, raise_errors=False): # Initialization function; pass in the client parameter, which is the UDS communication object.
         self.client = client
-
-    def debug_print(self,msg): #Print the current time (in blue) and the message
-        print(f"\033[34m{datetime.datetime.now()}\033[0m: {msg}")
+        self.raise_errors = raise_errors # True: the FoxPi_* writers log and re-raise errors (e.g. CircuitOpen, timeouts) instead of returning None
+        self.s3_timeout = s3_timeout # ECU S3 server timer: the session falls back to default after this many idle seconds
+        self.session = None # diagnostic session the ECU is known to be in, None = unknown
+        self.security_level = None # unlocked security access level, None = locked
+        self.last_activity = 0.0 # time.monotonic() of the last request sent in the current session
+        self.observers = [] # callables observer(did, direction, data) told about every successful DID write, e.g. FoxPiRecorder
+        self.log = FOXPI_LOG # payloads and responses are logged at DEBUG level, errors at ERROR, written by the log's writer thread
+
+    def idle(self): # seconds since the last request, counting any traffic on a shared FoxPiChannel (e.g. FoxPiKeepAlive)
+        return time.monotonic() - max(self.last_activity, getattr(self.client, "last_activity", 0.0))
+
+    def reset_session(self): # forget the cached session and security state, the next write enters and unlocks again
+        self.session = None
+        self.security_level = None
+
+    def ensure_unlocked(self): # enter the extended session and unlock security level 1 only when the cached state says it is needed
+        if self.session is not None and self.idle() > self.s3_timeout:
+            self.reset_session() # S3 expired, the ECU already dropped back to the default session
+        if self.session != DiagnosticSessionControl.Session.extendedDiagnosticSession:
+            self.client.change_session(DiagnosticSessionControl.Session.extendedDiagnosticSession) #Change Diagnostic Session to Extended DiagnosticSession
+            self.session = DiagnosticSessionControl.Session.extendedDiagnosticSession
+            self.security_level = None # a session change always relocks security access
+        if self.security_level != 1:
+            self.client.unlock_security_access(1) #Set the security_access key=1
+            self.security_level = 1
+        self.last_activity = time.monotonic()
+
+    def keep_alive(self): # send a TesterPresent when the session has been idle for half of S3 so it is not dropped between writes
+        if self.session is not None and self.idle() > self.s3_timeout / 2:
+            FoxPiTP(self.client).TesterPresent()
+            self.last_activity = time.monotonic()
+
+    def write(self, did, data): # write data to the DID in the unlocked extended session, re-entering it once if the ECU reports it was lost
+        self.ensure_unlocked()
+        try:
+            response = self.client.write_data_by_identifier(did, data)
+        except NegativeResponseException as e:
+            # 0x7F: service not supported in the active session, 0x33: security access denied -> the ECU left the session
+            if e.response.code not in (Response.Code.ServiceNotSupportedInActiveSession, Response.Code.SecurityAccessDenied):
+                raise
+            self.reset_session()
+            self.ensure_unlocked()
+            response = self.client.write_data_by_identifier(did, data)
+        self.last_activity = time.monotonic()
+        for observer in self.observers:
+            observer(did, 1, data) # direction 1 = write
+        return response
+
+    def transaction(self, rollback=True, stop_on_error=True) -> FoxPiWriteTransaction: # collect several writes and send them under one session/unlock
+        return FoxPiWriteTransaction(self, rollback, stop_on_error)
+
+    def debug_print(self,msg): #Log the message at DEBUG level, printed with the current time (in blue) by the log writer
+        self.log.debug("FoxPiWriteDID", msg)
 
     def FoxPi_Driving_Ctrl(self,user_input:str) -> bytes: #Define FoxPi_Driving_Ctrl to write DID 0x1001
 
@@ -27,45 +275,21 @@ class FoxPiWriteDID:
             #to convert all elements to int, if they are float and integer, otherwise keep as is
             DID_list = [int(x) if isinstance(x, float) and x.is_integer() else x for x in user_input]
 
-            # <<4 is means shift left by 4 bits, <<1 is shift left by 1 bit
-            # 0 0 0 0 0 0 0 0
-            # 7 6 5 4 3 2 1 0
-            # Ex: 7 6 5 4, "<< 4" | 3 2 1, "<< 1" | 0
-            # Ex: 7 6 5 4 3 2 1 "<< 1" | 0
-            APS_bit = (DID_list[12] << 4) | (DID_list[11] << 1) | DID_list[10] # | is bitwise OR operation combining the bits into a single byte
-
-            # pack all user_input value into the byte_list array
-            byte_list = [
-                math.floor((DID_list[0]-(-15))/0.05).to_bytes(3, byteorder="big"), #math.floor rounds down to the nearest integer(3.7->3,-3.7->-4,5.0->5), ACCReq = 3byte
-                math.floor(DID_list[1]).to_bytes(1, byteorder="big"), #ACCReq_A = 1byte
-                math.floor(DID_list[2]/0.125).to_bytes(3, byteorder="big"), #TargetSpdReq = 3byte
-                math.floor(DID_list[3]).to_bytes(1, byteorder="big"), #TargetSpdReq_A = 1byte
-                math.floor(DID_list[4]).to_bytes(1, byteorder="big"),#Angle_Target_Valid = 1byte
-                math.floor(DID_list[5]).to_bytes(1,byteorder="big"), #Angle_Target_Req= 1byte
-                math.floor((DID_list[6]-(-900))/0.1).to_bytes(4, byteorder="big"), #Angle_Target = 4byte
-                math.floor(DID_list[7]).to_bytes(1, byteorder="big"), #Torque_Target_Valid = 1byte
-                math.floor(DID_list[8]).to_bytes(1, byteorder="big"), #Torque_Target_Req = 1byte
-                math.floor((DID_list[9]-(-10))/0.01).to_bytes(3, byteorder="big"), #Torque_Target = 3byte
-                APS_bit.to_bytes(1, byteorder="big"),  # APS = 1byte
-                math.floor(DID_list[13]/0.125).to_bytes(1, byteorder="big") #VINP_APSSpeedCMD_kph = 1byte
-            ] # all 21 bytes for FoxPi_Driving_Ctrl
-
-            ##merge the byte_list elements into a single contiguous bytes payload.
-            merged_bytes = b''.join(byte_list)
-
-            print(f"Processed input: {merged_bytes}")
-
-            #Change Diagnostic Session to Extended DiagnosticSession
-            response = self.client.change_session(DiagnosticSessionControl.Session.extendedDiagnosticSession)
-            response = self.client.unlock_security_access(1)#Set the security_access key=1
-            response = self.client.write_data_by_identifier(0x1001, merged_bytes)#write the previously merged_bytes to DID(0x1001)
-
-            self.debug_print(f"The response sevice is {response.service_data}, data is {response.data.hex()}")
+            # pack all user_input value into the 21 byte Driving_Ctrl frame (see DrivingCtrlEncoder for the layout)
+            merged_bytes = bytes(DrivingCtrlEncoder().encode(DID_list, validate=False))
+
+            self.log.debug("FoxPiWriteDID", "Processed input: %s", merged_bytes)
+
+            response = self.write(0x1001, merged_bytes) #write the previously merged_bytes to DID(0x1001) (session entry and unlock only when needed)
+
+            self.log.debug("FoxPiWriteDID", "The response sevice is %s, data is %s", response.service_data, Hex(response.data))
 
             return merged_bytes
         
         except Exception as e:#Print an error message if an error occurs
-            print(f"Error processing input: {e}")
+            self.log.error("FoxPiWriteDID", "Error processing input: %s", e)
+            if self.raise_errors:
+                raise
             return None
 
     def FoxPi_Lamp_Ctrl(self,user_input:str) -> bytes:#Define FoxPi_Lamp_Ctrl to write DID 0x1001
@@ -80,60 +304,20 @@ class FoxPiWriteDID:
             DID_list = [int(x) if float(x).is_integer() else (_ for _ in ()).throw(ValueError(f"\033[91mYou input not int：{x}\033[0m")) for x in user_input]
 
             
-            # bit1,bit2,bit3: Pack all user input values into their corresponding bit positions
-            bit1 = ((DID_list[7] << 7) | #Right_Daytime_Running_Light
-                        (DID_list[6] << 6) | #Right_Daytime_Running_Light_Control_Enable
-                        (DID_list[5] << 5) | #High_Beam
-                        (DID_list[4] << 4) | #High_Beam_Control_Enable
-                        (DID_list[3] << 3) | #Low_Beam
-                        (DID_list[2] << 2) | #Low_Beam_Control_Enable
-                        (DID_list[1] << 1) | #Position_Lamp
-                        (DID_list[0] << 0) ) #Position_Lamp_Control_Enable
-            
-            bit2 = ((DID_list[15] << 7) | #Brake_Lamp
-                        (DID_list[14] << 6) | #Brake_Lamp_Control_Enable
-                        (DID_list[13] << 5) | #Right_TurnLamp
-                        (DID_list[12] << 4) | #Right_TurnLamp_Control_Enable
-                        (DID_list[11] << 3) | #Left_TurnLamp
-                        (DID_list[10] << 2) | #Left_TurnLamp_Control_Enable
-                        (DID_list[9] << 1) | #Left_Daytime_Running_Light
-                        (DID_list[8] << 0) ) #Left_Daytime_Running_Light_Control_Enable
-            
-            bit3 = ((DID_list[21] << 5) | #Control area
-                        (DID_list[20] << 4) | #Amblight_Control_Enable
-                        (DID_list[19] << 3) | #Rear_Fog_Lamp
-                        (DID_list[18] << 2) | #Rear_Fog_Lamp_Control_Enable
-                        (DID_list[17] << 1) | #Reverse_Lamp
-                        (DID_list[16] << 0) ) #Reverse_Lamp_Control_Enable
-            
-
-
-            #Pack bit1~bit3 into the byte_list array (big-endian)
-            byte_list = [
-                bit1.to_bytes(1, byteorder="big"),
-                bit2.to_bytes(1, byteorder="big"),
-                bit3.to_bytes(1, byteorder="big"),
-                DID_list[22].to_bytes(1, byteorder="big"), #RGB 64 Color = 1byte
-                DID_list[23].to_bytes(1, byteorder="big"), #Bright adjustment
-                DID_list[24].to_bytes(1, byteorder="big")  #Breathing and Alert Mode
-            ]
-
-            print(f"Processed input: {byte_list}")
-            #merge the byte_list elements into a single contiguous bytes payload.
-            merged_bytes = b''.join(byte_list)
-            print(f"Merged bytes: {merged_bytes}")
+            #Pack all user input values into their bit positions of the 6 byte 0x100C frame (see encode_lamp_ctrl for the layout)
+            merged_bytes = encode_lamp_ctrl(DID_list, validate=False)
+            self.log.debug("FoxPiWriteDID", "Merged bytes: %s", merged_bytes)
 
-            #Change Diagnostic Session to Extended DiagnosticSession
-            response = self.client.change_session(DiagnosticSessionControl.Session.extendedDiagnosticSession)
-            response = self.client.unlock_security_access(1) #Set the security_access key=1
-            response = self.client.write_data_by_identifier(0x100C, merged_bytes)  #write the previously merged_bytes to DID(0x100C)
+            response = self.write(0x100C, merged_bytes) #write the previously merged_bytes to DID(0x100C) (session entry and unlock only when needed)
 
-            self.debug_print(f"The response sevice is {response.service_data}, data is {response.data.hex()}")
+            self.log.debug("FoxPiWriteDID", "The response sevice is %s, data is %s", response.service_data, Hex(response.data))
 
             return merged_bytes
                
         except Exception as e:#Print an error message if an error occurs
-            print(f"Error processing input: {e}")
+            self.log.error("FoxPiWriteDID", "Error processing input: %s", e)
+            if self.raise_errors:
+                raise
             return None
 
     def FoxPi_Ctrl_Enable_Switch(self,user_input:str) -> bytes:#Define FoxPi_Ctrl_Enable_Switch to write DID 0x1001
@@ -147,36 +331,34 @@ class FoxPiWriteDID:
             # Convert user_input[0] to a 1-byte value (big-endian)
             Ctrl_Enable = user_input[0].to_bytes(1, byteorder="big") # Convert user_input[0] to a 1-byte value (big-endian)
 
-            #Change Diagnostic Session to Extended DiagnosticSession
-            response = self.client.change_session(DiagnosticSessionControl.Session.extendedDiagnosticSession)
-            response = self.client.unlock_security_access(1) #Set the security_access key=1
-            response = self.client.write_data_by_identifier(0x1012, Ctrl_Enable) #write the previously merged_bytes to DID(0x1012)
+            response = self.write(0x1012, Ctrl_Enable) #write the previously merged_bytes to DID(0x1012) (session entry and unlock only when needed)
 
-            self.debug_print(f"The response sevice is {response.service_data}, data is {response.data.hex()}")
+            self.log.debug("FoxPiWriteDID", "The response sevice is %s, data is %s", response.service_data, Hex(response.data))
 
             return Ctrl_Enable
             
         except Exception as e:#Print an error message if an error occurs
-            print(f"Error processing input: {e}")
+            self.log.error("FoxPiWriteDID", "Error processing input: %s", e)
+            if self.raise_errors:
+                raise
             return None
             
     def Driving_Ctrl_toFF(self) -> bytes:#write the Driving_Ctrl signal to 0xFF (default value)
         
         try:
 
-            data_toFF = bytes([0xff]*21) # 21 bytes of 0xFF
-            print(f"Processed input: {data_toFF}")
+            data_toFF = DRIVING_CTRL_FF # 21 bytes of 0xFF
+            self.log.debug("FoxPiWriteDID", "Processed input: %s", data_toFF)
 
-            #Change Diagnostic Session to Extended DiagnosticSession
-            response = self.client.change_session(DiagnosticSessionControl.Session.extendedDiagnosticSession)
-            response = self.client.unlock_security_access(1)#Set the security_access key=1
-            response = self.client.write_data_by_identifier(0x1001, data_toFF)#write the previously merged_bytes to DID(0x1001)
+            response = self.write(0x1001, data_toFF) #write the previously merged_bytes to DID(0x1001) (session entry and unlock only when needed)
 
 
-            self.debug_print(f"The response sevice is {response.service_data}, data is {response.data.hex()}")
+            self.log.debug("FoxPiWriteDID", "The response sevice is %s, data is %s", response.service_data, Hex(response.data))
 
             return data_toFF
 
         except Exception as e:#Print an error message if an error occurs
-            print(f"Error processing: {e}")
+            self.log.error("FoxPiWriteDID", "Error processing: %s", e)
+            if self.raise_errors:
+                raise
             return None  
\ No newline at end of file
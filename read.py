@@ -5,6 +5,7 @@ from common import get_uds_client
 from client_config import DOIP_SERVER_IP, DoIP_LOGICAL_ADDRESS
 from FoxPi_read import FoxPiReadDID
 from FoxPi_DTC import FoxPiDTC
+from FoxPi_log import FOXPI_LOG, DEBUG
 import datetime
 
 
@@ -15,6 +16,7 @@ uds_connection = DoIPClientUDSConnector(doip_client) #Use the previously created
 assert uds_connection.is_open #Verify whether the UDS connection has been successfully established
 with Client(uds_connection, request_timeout=4, config=get_uds_client()) as client: #Execute it within a context manager so that the connection is automatically closed when finished.
     
+    FOXPI_LOG.set_level(DEBUG) #show every request in the interactive tool
     Foxpi = FoxPiReadDID(client)
     DTC = FoxPiDTC(client, doip_client)
     RID_map = {
@@ -34,6 +36,7 @@ with Client(uds_connection, request_timeout=4, config=get_uds_client()) as clien
     14: Foxpi.FoxPi_Ctrl_Enable_Switch,
     15: DTC.Read_DTCs,
     16: DTC.Clear_DTCs,
+    17: Foxpi.snapshot,
 }
     while True:
 
@@ -52,7 +55,9 @@ with Client(uds_connection, request_timeout=4, config=get_uds_client()) as clien
         if  RID==0:
             break
         elif excute:
-            for i,j in excute().items():
+            result = excute()
+            FOXPI_LOG.flush() #print the request log before the result
+            for i,j in result.items():
                 print(f"{i}: {j}")
         else:
             print("\033[91mInvalid input. Please enter a number between 1 to 18.\033[0m")
\ No newline at end of file
@@ -5,6 +5,7 @@ from client_config import DOIP_SERVER_IP, DoIP_LOGICAL_ADDRESS
 from udsoncan.client import Client
 from udsoncan.services import *
 from FoxPi_write import FoxPiWriteDID
+from FoxPi_log import FOXPI_LOG, DEBUG
 
 
 
@@ -13,6 +14,7 @@ uds_connection = DoIPClientUDSConnector(doip_client) #Use the previously created
 assert uds_connection.is_open #Verify whether the UDS connection has been successfully established
 with Client(uds_connection, request_timeout=4, config=get_uds_client()) as client: #Execute it within a context manager so that the connection is automatically closed when finished.
 
+    FOXPI_LOG.set_level(DEBUG) #show every payload and response in the interactive tool
     FoxPi = FoxPiWriteDID(client)
     WID_map = {
         1: FoxPi.FoxPi_Driving_Ctrl,
@@ -83,6 +85,8 @@ with Client(uds_connection, request_timeout=4, config=get_uds_client()) as clien
                             continue
             print(f"\033[92mYour input values are: {user_input}\033[0m")
             excute(user_input)
+            FOXPI_LOG.flush()
         else:
             print(f"\033[92mNo parameters needed input for {excute.__name__}\033[0m")
-            excute()
\ No newline at end of file
+            excute()
+            FOXPI_LOG.flush()
\ No newline at end of file